@@ -6,9 +6,8 @@ from django.forms import modelformset_factory, inlineformset_factory
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import date, timedelta
-from django.db.models import Q
 from .models import Appointment, DailySlots, Payment, PaymentItem, PaymentTransaction
-from patients.models import Patient
+from patients.models import Patient, PH_MOBILE_RE, PHONE_SEPARATORS
 from services.models import Service, Discount
 from users.models import User
 import re
@@ -360,9 +359,8 @@ class PublicBookingForm(forms.Form):
             return ''
         
         # Philippine mobile number pattern
-        phone_pattern = re.compile(r'^(\+63|0)?9\d{9}$')
-        clean_contact = contact_number.replace(' ', '').replace('-', '')
-        if not phone_pattern.match(clean_contact):
+        clean_contact = contact_number.translate(PHONE_SEPARATORS)
+        if not PH_MOBILE_RE.match(clean_contact):
             raise ValidationError('Please enter a valid Philippine mobile number (e.g., +639123456789).')
         
         return clean_contact
@@ -412,20 +410,17 @@ class PublicBookingForm(forms.Form):
             # Check if patient already exists
             email = cleaned_data.get('email', '').strip()
             contact_number = cleaned_data.get('contact_number', '').strip()
+            # Stored numbers are always normalized (+639XXXXXXXXX)
+            normalized_number = Patient.normalize_phone(contact_number)
             
-            existing_query = Q()
-            if email:
-                existing_query |= Q(email__iexact=email, is_active=True)
-            if contact_number:
-                existing_query |= Q(contact_number=contact_number, is_active=True)
-            
-            if existing_query:
-                existing_patient = Patient.objects.filter(existing_query).first()
-                if existing_patient:
-                    if existing_patient.email and email and existing_patient.email.lower() == email.lower():
-                        raise ValidationError(f'A patient with email "{email}" already exists. Please use "Existing Patient" option.')
-                    elif existing_patient.contact_number and contact_number and existing_patient.contact_number == contact_number:
-                        raise ValidationError(f'A patient with contact number "{contact_number}" already exists. Please use "Existing Patient" option.')
+            existing_patient = Patient.lookup_active(
+                email=email, contact_numbers=[normalized_number]
+            ).only('id', 'email', 'contact_number').first()
+            if existing_patient:
+                if existing_patient.email and email and existing_patient.email.lower() == email.lower():
+                    raise ValidationError(f'A patient with email "{email}" already exists. Please use "Existing Patient" option.')
+                elif normalized_number and existing_patient.contact_number == normalized_number:
+                    raise ValidationError(f'A patient with contact number "{contact_number}" already exists. Please use "Existing Patient" option.')
         
         # Validate appointment availability
         appointment_date = cleaned_data.get('appointment_date')
@@ -440,19 +435,9 @@ class PublicBookingForm(forms.Form):
     
     def _find_existing_patient(self, identifier):
         """Find existing patient by email or contact number"""
-        query = Q(is_active=True)
-        
         if '@' in identifier:
-            query &= Q(email__iexact=identifier)
-        else:
-            clean_identifier = identifier.replace(' ', '').replace('-', '').replace('+', '')
-            query &= (
-                Q(contact_number=identifier) | 
-                Q(contact_number=clean_identifier) |
-                (Q(contact_number__endswith=clean_identifier[-10:]) if len(clean_identifier) >= 10 else Q())
-            )
-        
-        return Patient.objects.filter(query).first()
+            return Patient.lookup_active(email=identifier).first()
+        return Patient.lookup_active(contact_numbers=[Patient.normalize_phone(identifier)]).first()
     
     def save(self):
         """Create appointment from form data"""
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-17 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_appointment_date_period_status_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_patient_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payment_patient_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'appointment_date'], name='appt_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date', 'status'], name='appt_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['patient', 'status', 'next_due_date'], name='pay_pat_status_due_idx'),
+        ),
+    ]
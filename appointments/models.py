@@ -1,5 +1,5 @@
 # appointments/models.py - Complete model with AM/PM slot system
-from django.db import models, transaction
+from django.db import models, transaction, IntegrityError
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import datetime, date, timedelta, time
@@ -144,66 +144,90 @@ class DailySlots(models.Model):
             default_am = SystemSetting.get_int_setting('default_am_slots', 6)
             default_pm = SystemSetting.get_int_setting('default_pm_slots', 8)
             
-            # Create with default slots
-            daily_slots = cls.objects.create(
-                date=date_obj,
-                am_slots=default_am,
-                pm_slots=default_pm,
-                created_by=created_by
-            )
+            # Create with default slots; if a concurrent request inserted the
+            # same date first, the unique constraint fires and we read its row
+            try:
+                with transaction.atomic():
+                    daily_slots = cls.objects.create(
+                        date=date_obj,
+                        am_slots=default_am,
+                        pm_slots=default_pm,
+                        created_by=created_by
+                    )
+            except IntegrityError:
+                return cls.objects.get(date=date_obj), False
             return daily_slots, True
     
+    @classmethod
+    def lock_for_date(cls, date_obj):
+        """
+        Lock the slots row for a date until the surrounding transaction ends so
+        concurrent bookings for that date check availability one at a time.
+        Must be called inside transaction.atomic(); returns None for dates that
+        have no slots (Sundays, past dates).
+        """
+        daily_slots, _ = cls.get_or_create_for_date(date_obj)
+        if not daily_slots:
+            return None
+        return cls.objects.select_for_update().get(pk=daily_slots.pk)
+    
     @classmethod
     def get_availability_for_range(cls, start_date, end_date, include_pending=True):
         """
         Get availability data for a date range with context-aware counting
+
+        Sundays and past dates are dropped before querying, and the booked
+        counts for every remaining date come from one grouped query instead
+        of per-date COUNTs.
         """
+        today = timezone.now().date()
+        valid_dates = [
+            day for day in (start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1))
+            if day >= today and day.weekday() != 6
+        ]
+        if not valid_dates:
+            return {}
+
+        slots_dict = {slot.date: slot for slot in cls.objects.filter(date__in=valid_dates)}
+
+        # {(date, period, status): count} for every status that can block a slot
+        booked = {
+            (row['appointment_date'], row['period'], row['status']): row['count']
+            for row in Appointment.objects.filter(
+                appointment_date__in=valid_dates,
+                status__in=Appointment.BLOCKING_STATUSES
+            ).values('appointment_date', 'period', 'status').annotate(count=models.Count('id')).order_by()
+        }
+        if include_pending:
+            blocking_statuses = Appointment.BLOCKING_STATUSES
+        else:
+            blocking_statuses = [status for status in Appointment.BLOCKING_STATUSES if status != 'pending']
+
         availability = {}
-        
-        # Get existing slots
-        existing_slots = cls.objects.filter(
-            date__gte=start_date,
-            date__lte=end_date
-        )
-        
-        slots_dict = {slot.date: slot for slot in existing_slots}
-        
-        # Check each date in range
-        current_date = start_date
-        while current_date <= end_date:
-            # Skip Sundays and past dates
-            if current_date.weekday() != 6 and current_date >= timezone.now().date():
-                if current_date in slots_dict:
-                    slot = slots_dict[current_date]
-                    availability[current_date] = {
-                        'am_available': slot.get_available_am_slots(include_pending=include_pending),
-                        'pm_available': slot.get_available_pm_slots(include_pending=include_pending),
-                        'am_total': slot.am_slots,
-                        'pm_total': slot.pm_slots
-                    }
-                    
-                    # For admin backend, also include pending counts
-                    if not include_pending:
-                        pending_counts = slot.get_pending_counts()
-                        availability[current_date].update(pending_counts)
-                        
-                else:
-                    # Default availability for dates without slots
-                    daily_slots, created = cls.get_or_create_for_date(current_date)
-                    if daily_slots:
-                        availability[current_date] = {
-                            'am_available': daily_slots.get_available_am_slots(include_pending=include_pending),
-                            'pm_available': daily_slots.get_available_pm_slots(include_pending=include_pending),
-                            'am_total': daily_slots.am_slots,
-                            'pm_total': daily_slots.pm_slots
-                        }
-                        
-                        if not include_pending:
-                            pending_counts = daily_slots.get_pending_counts()
-                            availability[current_date].update(pending_counts)
-            
-            current_date += timedelta(days=1)
-        
+        for current_date in valid_dates:
+            slot = slots_dict.get(current_date)
+            if slot is None:
+                # Default availability for dates without slots
+                slot, created = cls.get_or_create_for_date(current_date)
+                if not slot:
+                    continue
+
+            booked_am = sum(booked.get((current_date, 'AM', status), 0) for status in blocking_statuses)
+            booked_pm = sum(booked.get((current_date, 'PM', status), 0) for status in blocking_statuses)
+            availability[current_date] = {
+                'am_available': max(0, slot.am_slots - booked_am),
+                'pm_available': max(0, slot.pm_slots - booked_pm),
+                'am_total': slot.am_slots,
+                'pm_total': slot.pm_slots
+            }
+
+            # For admin backend, also include pending counts
+            if not include_pending:
+                availability[current_date].update({
+                    'am_pending': booked.get((current_date, 'AM', 'pending'), 0),
+                    'pm_pending': booked.get((current_date, 'PM', 'pending'), 0),
+                })
+
         return availability
 
 
@@ -282,9 +306,15 @@ class Appointment(models.Model):
         ordering = ['-requested_at']
         indexes = [
             models.Index(fields=['status'], name='appt_status_idx'),
-            models.Index(fields=['patient'], name='appt_patient_idx'),
+            # Per-patient history and last-visit lookups; the patient prefix
+            # still serves plain patient filters
+            models.Index(fields=['patient', 'appointment_date'], name='appt_patient_date_idx'),
             models.Index(fields=['assigned_dentist'], name='appt_assigned_dentist_idx'),
-            models.Index(fields=['appointment_date', 'period'], name='appt_date_period_idx'),
+            # Covers slot counting (date + period + blocking status); the
+            # (appointment_date, period) prefix still serves date/period lookups
+            models.Index(fields=['appointment_date', 'period', 'status'], name='appt_date_period_status_idx'),
+            # Date range + status filters that don't constrain period (patient activity filters)
+            models.Index(fields=['appointment_date', 'status'], name='appt_date_status_idx'),
             models.Index(fields=['requested_at'], name='appt_requested_idx'),
             models.Index(fields=['temp_email'], name='appt_temp_email_idx'),
             models.Index(fields=['temp_contact_number'], name='appt_temp_contact_idx'),
@@ -335,33 +365,17 @@ class Appointment(models.Model):
         
         # Primary match: email (exact, case-insensitive)
         if self.temp_email:
-            patient = Patient.objects.filter(
-                email__iexact=self.temp_email.strip(),
-                is_active=True
-            ).first()
+            patient = Patient.lookup_active(email=self.temp_email.strip()).first()
             if patient:
                 return patient
         
-        # Secondary match: phone number (cleaned format)
+        # Secondary match: phone number (contact numbers are stored normalized)
         if self.temp_contact_number:
-            # Clean the phone number (remove spaces, dashes, plus signs)
-            clean_temp_phone = self.temp_contact_number.replace(' ', '').replace('-', '').replace('+', '')
-            
-            # Try exact match first
-            patient = Patient.objects.filter(
-                contact_number=self.temp_contact_number,
-                is_active=True
+            patient = Patient.lookup_active(
+                contact_numbers=[Patient.normalize_phone(self.temp_contact_number)]
             ).first()
             if patient:
                 return patient
-            
-            # Try cleaned match
-            patients = Patient.objects.filter(is_active=True)
-            for patient in patients:
-                if patient.contact_number:
-                    clean_patient_phone = patient.contact_number.replace(' ', '').replace('-', '').replace('+', '')
-                    if clean_patient_phone and clean_temp_phone and clean_patient_phone == clean_temp_phone:
-                        return patient
         
         return None
     
@@ -648,7 +662,8 @@ class Payment(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['status'], name='payment_status_idx'),
-            models.Index(fields=['patient'], name='payment_patient_idx'),
+            # Patient payment summary (open balances by next due date)
+            models.Index(fields=['patient', 'status', 'next_due_date'], name='pay_pat_status_due_idx'),
             models.Index(fields=['next_due_date'], name='payment_due_date_idx'),
             models.Index(fields=['created_at'], name='payment_created_idx'),
         ]
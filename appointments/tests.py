@@ -1,3 +1,120 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from appointments.forms import PublicBookingForm
+from appointments.models import Appointment, DailySlots
+from patients.models import Patient
+from services.models import Service
+
+
+def next_bookable_date():
+    """First day after today that isn't a Sunday"""
+    day = timezone.now().date() + timedelta(days=1)
+    if day.weekday() == 6:
+        day += timedelta(days=1)
+    return day
+
+
+class PublicBookingFormPatientLookupTests(TestCase):
+    """Stored contact numbers are normalized, so lookups must normalize the input too"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = Service.objects.create(name='Cleaning', duration_minutes=30)
+        cls.patient = Patient.objects.create(
+            first_name='Maria',
+            last_name='Santos',
+            email='maria@example.com',
+            contact_number='09171234567',
+        )
+
+    def booking_data(self, **overrides):
+        data = {
+            'patient_type': 'new',
+            'first_name': 'Ana',
+            'last_name': 'Cruz',
+            'email': 'ana@example.com',
+            'service': self.service.pk,
+            'appointment_date': next_bookable_date().isoformat(),
+            'period': 'AM',
+            'agreed_to_terms': True,
+        }
+        data.update(overrides)
+        return data
+
+    def test_new_patient_with_existing_number_in_local_form_is_rejected(self):
+        form = PublicBookingForm(data=self.booking_data(contact_number='0917 123 4567'))
+        self.assertFalse(form.is_valid())
+        self.assertIn('already exists', str(form.non_field_errors()))
+
+    def test_new_patient_with_existing_email_is_rejected(self):
+        form = PublicBookingForm(data=self.booking_data(email='MARIA@example.com'))
+        self.assertFalse(form.is_valid())
+        self.assertIn('already exists', str(form.non_field_errors()))
+
+    def test_existing_patient_found_by_any_phone_spelling(self):
+        for identifier in ['09171234567', '+639171234567', '639171234567', '0917-123-4567']:
+            with self.subTest(identifier=identifier):
+                form = PublicBookingForm(data=self.booking_data(
+                    patient_type='existing', patient_identifier=identifier
+                ))
+                self.assertTrue(form.is_valid(), form.errors)
+                self.assertEqual(form.cleaned_data['patient'], self.patient)
+
+    def test_existing_patient_found_by_email_case_insensitively(self):
+        form = PublicBookingForm(data=self.booking_data(
+            patient_type='existing', patient_identifier='Maria@Example.com'
+        ))
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['patient'], self.patient)
+
+
+class DailySlotsAvailabilityForRangeTests(TestCase):
+    """get_availability_for_range counts every date from one grouped query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = Service.objects.create(name='Checkup', duration_minutes=30)
+        cls.day = next_bookable_date()
+        DailySlots.objects.create(date=cls.day, am_slots=5, pm_slots=4)
+        for period, status in [
+            ('AM', 'pending'), ('AM', 'confirmed'), ('AM', 'completed'), ('AM', 'cancelled'),
+            ('PM', 'pending'), ('PM', 'pending'), ('PM', 'rejected'),
+        ]:
+            Appointment.objects.create(
+                service=cls.service,
+                appointment_date=cls.day,
+                period=period,
+                status=status,
+                temp_first_name='Walk',
+                temp_last_name='In',
+                temp_email='walk.in@example.com',
+            )
+
+    def test_blocking_statuses_reduce_availability(self):
+        availability = DailySlots.get_availability_for_range(self.day, self.day)
+        self.assertEqual(availability[self.day], {
+            'am_available': 2, 'pm_available': 2, 'am_total': 5, 'pm_total': 4,
+        })
+
+    def test_excluding_pending_reports_pending_counts(self):
+        availability = DailySlots.get_availability_for_range(self.day, self.day, include_pending=False)
+        self.assertEqual(availability[self.day], {
+            'am_available': 3, 'pm_available': 4, 'am_total': 5, 'pm_total': 4,
+            'am_pending': 1, 'pm_pending': 2,
+        })
+
+    def test_counts_come_from_a_single_appointment_query(self):
+        # one DailySlots query + one grouped Appointment query
+        with self.assertNumQueries(2):
+            DailySlots.get_availability_for_range(self.day, self.day)
 
-# Create your tests here.
+    def test_sundays_and_past_dates_are_skipped(self):
+        today = timezone.now().date()
+        availability = DailySlots.get_availability_for_range(today - timedelta(days=3), today + timedelta(days=7))
+        self.assertTrue(availability)
+        for day in availability:
+            self.assertGreaterEqual(day, today)
+            self.assertNotEqual(day.weekday(), 6)
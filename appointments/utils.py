@@ -180,6 +180,44 @@ def validate_appointment_date(appointment_date):
     return True, "Date is valid"
 
 
+def parse_date_range(start_date_str, end_date_str, max_days=90):
+    """
+    Parse and validate a YYYY-MM-DD date range from query parameters
+    
+    A start date in the past is moved up to today rather than rejected.
+    
+    Args:
+        start_date_str: str
+        end_date_str: str
+        max_days: int (default 90)
+    
+    Returns:
+        tuple: (start_date, end_date)
+    
+    Raises:
+        ValidationError: With the message to show the client
+    """
+    if not start_date_str or not end_date_str:
+        raise ValidationError('start_date and end_date are required')
+    
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError('Invalid date format. Use YYYY-MM-DD')
+    
+    start_date = max(start_date, timezone.now().date())
+    
+    if end_date < start_date:
+        raise ValidationError('End date must be after or equal to start date')
+    
+    # Limit range to prevent excessive queries
+    if (end_date - start_date).days > max_days:
+        raise ValidationError(f'Date range too large. Maximum {max_days} days.')
+    
+    return start_date, end_date
+
+
 def get_period_display_time(period):
     """
     Get display time range for AM/PM period
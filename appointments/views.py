@@ -8,18 +8,22 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ValidationError
-from django.db import transaction
+from django.core.validators import validate_email
+from django.db import transaction, IntegrityError
 from django.db.models import Q
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.http import JsonResponse, HttpResponse
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, TemplateView
 
 from .models import Appointment, DailySlots
 from .forms import AppointmentForm, DailySlotsForm, AppointmentNoteFieldForm
+from .utils import parse_date_range
 from patients.models import Patient
 from users.models import User
 from core.models import AuditLog
+from core.utils import OrjsonResponse, slot_availability_cache_key, SLOT_AVAILABILITY_CACHE_TIMEOUT
 from django.views.decorators.http import require_POST
 
 
@@ -706,48 +710,31 @@ def get_slot_availability_api(request):
     FIXED to handle past dates properly
     """
     if request.method != 'GET':
-        return JsonResponse({'error': 'Method not allowed'}, status=405)
+        return OrjsonResponse({'error': 'Method not allowed'}, status=405)
     
     start_date_str = request.GET.get('start_date')
     end_date_str = request.GET.get('end_date')
     
-    if not start_date_str or not end_date_str:
-        return JsonResponse({'error': 'start_date and end_date are required'}, status=400)
-    
+    # Past start dates are moved up to today rather than rejected
     try:
-        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-    except ValueError:
-        return JsonResponse({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
-    
-    # Validate date range
+        start_date, end_date = parse_date_range(start_date_str, end_date_str)
+    except ValidationError as e:
+        return OrjsonResponse({'error': e.message}, status=400)
     today = timezone.now().date()
     
-    # FIXED: Don't reject if start_date is in the past, just adjust it
-    if start_date < today:
-        start_date = today
-    
-    if end_date < start_date:
-        return JsonResponse({'error': 'End date must be after or equal to start date'}, status=400)
-    
-    # Limit range to prevent excessive queries
-    if (end_date - start_date).days > 90:
-        return JsonResponse({'error': 'Date range too large. Maximum 90 days.'}, status=400)
+    # Served from cache until an Appointment/DailySlots change bumps the version
+    cache_key = slot_availability_cache_key(today, start_date_str, end_date_str)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return HttpResponse(cached, content_type='application/json')
     
     # Get availability for date range
     availability = DailySlots.get_availability_for_range(start_date, end_date)
     
-    # Format for frontend
-    formatted_availability = {}
-    for date_obj, slots in availability.items():
-        date_str = date_obj.strftime('%Y-%m-%d')
-        
-        # Skip Sundays and past dates (but include today)
-        if date_obj.weekday() == 6 or date_obj < today:
-            continue
-        
-        formatted_availability[date_str] = {
-            'date': date_str,
+    # Format for frontend (Sundays and past dates were already dropped)
+    formatted_availability = {
+        date_obj.isoformat(): {
+            'date': date_obj.isoformat(),
             'weekday': date_obj.strftime('%A'),
             'am_slots': {
                 'available': slots['am_available'],
@@ -761,8 +748,10 @@ def get_slot_availability_api(request):
             },
             'has_availability': slots['am_available'] > 0 or slots['pm_available'] > 0
         }
+        for date_obj, slots in availability.items()
+    }
     
-    return JsonResponse({
+    response = OrjsonResponse({
         'availability': formatted_availability,
         'date_range': {
             'start': start_date_str,
@@ -770,6 +759,11 @@ def get_slot_availability_api(request):
             'adjusted_start': start_date.strftime('%Y-%m-%d') if start_date.strftime('%Y-%m-%d') != start_date_str else None
         }
     })
+    # Creating default slot rows above bumps the version; an entry stored under
+    # the old key would never be read, so only cache if the version held
+    if cache_key == slot_availability_cache_key(today, start_date_str, end_date_str):
+        cache.set(cache_key, response.content, SLOT_AVAILABILITY_CACHE_TIMEOUT)
+    return response
 
 
 def find_patient_api(request):
@@ -778,13 +772,13 @@ def find_patient_api(request):
     Supports both exact matching and autocomplete search
     """
     if request.method != 'GET':
-        return JsonResponse({'error': 'Method not allowed'}, status=405)
+        return OrjsonResponse({'error': 'Method not allowed'}, status=405)
     
     identifier = request.GET.get('identifier', '').strip()
     search_type = request.GET.get('type', 'exact')  # 'exact' or 'autocomplete'
     
     if not identifier or len(identifier) < 2:
-        return JsonResponse({'found': False, 'patients': []})
+        return OrjsonResponse({'found': False, 'patients': []})
     
     # AUTOCOMPLETE MODE: Return list of matching patients
     if search_type == 'autocomplete':
@@ -793,7 +787,7 @@ def find_patient_api(request):
         ).filter(
             Q(first_name__icontains=identifier) |
             Q(last_name__icontains=identifier)
-        ).select_related().order_by('last_name', 'first_name')[:10]
+        ).only('id', 'first_name', 'last_name', 'email', 'contact_number').order_by('last_name', 'first_name')[:10]
         
         patient_list = [{
             'id': p.id,
@@ -802,29 +796,30 @@ def find_patient_api(request):
             'contact_number': p.contact_number or 'No phone'
         } for p in patients]
         
-        return JsonResponse({
+        return OrjsonResponse({
             'patients': patient_list,
             'count': len(patient_list)
         })
     
     # EXACT MODE: Original functionality for booking form
-    query = Q(is_active=True)
-    
+    # Inputs that can't be an email or phone number never match, so skip the query
     if '@' in identifier:
-        query &= Q(email__iexact=identifier)
+        try:
+            validate_email(identifier)
+        except ValidationError:
+            return OrjsonResponse({'found': False})
+        patients = Patient.lookup_active(email=identifier)
     else:
-        # Handle contact number with flexible formatting
-        clean_identifier = identifier.replace(' ', '').replace('-', '').replace('+', '')
-        query &= (
-            Q(contact_number=identifier) | 
-            Q(contact_number=clean_identifier) |
-            (Q(contact_number__endswith=clean_identifier[-10:]) if len(clean_identifier) >= 10 else Q())
-        )
+        # Contact numbers are stored normalized, so normalize the input the same way
+        contact_number = Patient.normalize_phone(identifier)
+        if not contact_number.lstrip('+').isdigit() or len(contact_number) < 7:
+            return OrjsonResponse({'found': False})
+        patients = Patient.lookup_active(contact_numbers=[contact_number])
     
-    patient = Patient.objects.filter(query).first()
+    patient = patients.only('id', 'first_name', 'last_name', 'email', 'contact_number').first()
     
     if patient:
-        return JsonResponse({
+        return OrjsonResponse({
             'found': True,
             'patient': {
                 'id': patient.id,
@@ -834,7 +829,7 @@ def find_patient_api(request):
             }
         })
     else:
-        return JsonResponse({'found': False})
+        return OrjsonResponse({'found': False})
 
 
 # ACTION VIEWS
@@ -915,6 +910,8 @@ def approve_appointment(request, pk):
             
             messages.success(request, f'Appointment for {patient_name} has been approved.')
             
+    except IntegrityError:
+        messages.error(request, 'Cannot approve: another active patient already uses this email or contact number.')
     except Exception as e:
         messages.error(request, f'Error approving appointment: {str(e)}')
     
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 04:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_auditlog_options_auditlog_description_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='core_auditl_timesta_5bf34e_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 04:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_auditlog_timestamp_id_desc_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', 'action', '-timestamp'], name='core_auditl_user_id_1afdc0_idx'),
+        ),
+    ]
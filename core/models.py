@@ -2,6 +2,12 @@
 from django.db import models
 from django.utils import timezone
 from datetime import datetime
+import time
+
+# In-process snapshot of active SystemSetting values, see SystemSetting.get_values()
+SETTINGS_CACHE_TTL = 60
+_settings_snapshot = None
+_settings_loaded_at = 0.0
 
 
 class SystemSetting(models.Model):
@@ -21,40 +27,60 @@ class SystemSetting(models.Model):
     def __str__(self):
         return f"{self.key}: {self.value}"
     
+    @classmethod
+    def get_values(cls):
+        """
+        All active settings as {key: value}, loaded with a single query and
+        kept in-process for SETTINGS_CACHE_TTL seconds. core.signals clears
+        the snapshot whenever a setting is saved or deleted; the TTL bounds
+        staleness in other worker processes.
+        """
+        global _settings_snapshot, _settings_loaded_at
+        now = time.monotonic()
+        if _settings_snapshot is None or now - _settings_loaded_at > SETTINGS_CACHE_TTL:
+            _settings_snapshot = dict(cls.objects.filter(is_active=True).values_list('key', 'value'))
+            _settings_loaded_at = now
+        return _settings_snapshot
+    
+    @classmethod
+    def clear_cache(cls):
+        """Force the next read to reload settings from the database"""
+        global _settings_snapshot
+        _settings_snapshot = None
+    
     @classmethod
     def get_setting(cls, key, default=None):
         """Get a setting value by key"""
-        try:
-            setting = cls.objects.get(key=key, is_active=True)
-            return setting.value
-        except cls.DoesNotExist:
-            return default
+        return cls.get_values().get(key, default)
     
     @classmethod
     def get_int_setting(cls, key, default=0):
         """Get an integer setting value"""
+        value = cls.get_values().get(key)
+        if value is None:
+            return default
         try:
-            setting = cls.objects.get(key=key, is_active=True)
-            return int(setting.value)
-        except (cls.DoesNotExist, ValueError):
+            return int(value)
+        except ValueError:
             return default
     
     @classmethod
     def get_bool_setting(cls, key, default=False):
         """Get a boolean setting value"""
-        try:
-            setting = cls.objects.get(key=key, is_active=True)
-            return setting.value.lower() in ('true', '1', 'yes', 'on')
-        except cls.DoesNotExist:
+        value = cls.get_values().get(key)
+        if value is None:
             return default
+        return value.lower() in ('true', '1', 'yes', 'on')
     
     @classmethod
     def get_time_setting(cls, key, default=None):
         """Get a time setting value"""
+        value = cls.get_values().get(key)
+        if value is None:
+            return default
         try:
-            setting = cls.objects.get(key=key, is_active=True)
-            return datetime.strptime(setting.value, '%H:%M').time()
-        except (cls.DoesNotExist, ValueError):
+            return datetime.strptime(value, '%H:%M').time()
+        except ValueError:
             return default
     
     @classmethod
@@ -119,6 +145,8 @@ class AuditLog(models.Model):
             models.Index(fields=['model_name', 'timestamp']),
             models.Index(fields=['action', 'timestamp']),
             models.Index(fields=['timestamp']),
+            models.Index(fields=['-timestamp', '-id']),
+            models.Index(fields=['user', 'action', '-timestamp']),
         ]
         verbose_name = 'Audit Log'
         verbose_name_plural = 'Audit Logs'
@@ -3,8 +3,13 @@ from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
 from django.db import transaction
-from .models import AuditLog
+from django.core.cache import cache
+from .models import AuditLog, SystemSetting
 from .middleware import get_current_user
+from .utils import (
+    build_services_json, service_cache_key, PUBLIC_CACHE_TIMEOUT, HOME_SERVICES_CACHE_KEY, SERVICES_JSON_CACHE_KEY,
+    SYSTEM_SETTINGS_CACHE_KEY, MAINTENANCE_STATS_CACHE_KEY, bump_slot_availability_version,
+)
 
 
 # Track original state before save
@@ -131,6 +136,47 @@ def log_model_delete(sender, instance, **kwargs):
     )
 
 
+@receiver(post_save, sender='services.Service')
+@receiver(post_delete, sender='services.Service')
+def refresh_public_services_cache(sender, instance, **kwargs):
+    """Re-serialize the booking services JSON after commit; drop the other service entries"""
+    cache.delete_many([HOME_SERVICES_CACHE_KEY, service_cache_key(instance.pk)])
+    transaction.on_commit(
+        lambda: cache.set(SERVICES_JSON_CACHE_KEY, build_services_json(), PUBLIC_CACHE_TIMEOUT)
+    )
+
+
+@receiver(post_save, sender=SystemSetting)
+@receiver(post_delete, sender=SystemSetting)
+def clear_settings_snapshot(sender, instance, **kwargs):
+    """Reload settings on next read after any change"""
+    SystemSetting.clear_cache()
+
+
+@receiver(post_save, sender='core.SystemSetting')
+@receiver(post_delete, sender='core.SystemSetting')
+@receiver(post_save, sender='appointments.Appointment')
+@receiver(post_delete, sender='appointments.Appointment')
+@receiver(post_save, sender='patients.Patient')
+@receiver(post_delete, sender='patients.Patient')
+@receiver(post_save, sender='services.Service')
+@receiver(post_delete, sender='services.Service')
+@receiver(post_save, sender='users.User')
+@receiver(post_delete, sender='users.User')
+def clear_system_settings_cache(sender, instance, **kwargs):
+    """Drop the cached system settings page context and maintenance hub counts"""
+    cache.delete_many([SYSTEM_SETTINGS_CACHE_KEY, MAINTENANCE_STATS_CACHE_KEY])
+
+
+@receiver(post_save, sender='appointments.Appointment')
+@receiver(post_delete, sender='appointments.Appointment')
+@receiver(post_save, sender='appointments.DailySlots')
+@receiver(post_delete, sender='appointments.DailySlots')
+def invalidate_slot_availability(sender, instance, **kwargs):
+    """Orphan cached availability responses once the booking change commits"""
+    transaction.on_commit(bump_slot_availability_version)
+
+
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
     """Log successful user login"""
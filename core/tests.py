@@ -1,3 +1,241 @@
-from django.test import TestCase
+import json
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from appointments.models import Appointment, DailySlots
+from services.models import Service
+
+from .utils import (
+    LargeTablePaginator, bump_slot_availability_version, count_many, parse_iso_date,
+    slot_availability_cache_key, SLOT_AVAILABILITY_VERSION_KEY,
+)
+from .views import MAX_BOOKING_PAYLOAD_BYTES
+
+
+def next_bookable_date():
+    """First day after today that isn't a Sunday"""
+    day = timezone.localdate() + timedelta(days=1)
+    if day.weekday() == 6:
+        day += timedelta(days=1)
+    return day
+
+
+class ParseIsoDateTests(SimpleTestCase):
+    """parse_iso_date takes the fromisoformat fast path for YYYY-MM-DD only"""
+
+    def test_accepts_plain_iso_date(self):
+        self.assertEqual(parse_iso_date('2026-11-03'), date(2026, 11, 3))
+
+    def test_rejects_other_iso_8601_spellings(self):
+        for value in ['20261103', '2026-W45-2', '2026-307', '2026-11-03T00:00', '2026-11-03\n', '2026-1-3', '']:
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_iso_date(value)
+
+    def test_rejects_impossible_dates(self):
+        with self.assertRaises(ValueError):
+            parse_iso_date('2026-02-30')
+
+
+class CountManyTests(TestCase):
+    """count_many returns every count from one query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(5):
+            Service.objects.create(name=f'Service {index}', duration_minutes=30, is_archived=index < 2)
+
+    def test_counts_match_individual_queries(self):
+        with self.assertNumQueries(1):
+            counts = count_many(
+                all_services=Service.objects.all(),
+                active=Service.objects.filter(is_archived=False),
+                named=Service.objects.filter(name__in=['Service 0', 'Service 4']),
+                none=Service.objects.filter(name='Missing'),
+            )
+        self.assertEqual(counts, {'all_services': 5, 'active': 3, 'named': 2, 'none': 0})
+
+
+class LargeTablePaginatorTests(TestCase):
+    """Pages are read pk-first, then loaded by pk, without changing their contents"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(7):
+            Service.objects.create(name=f'Service {index}', duration_minutes=30)
+
+    def setUp(self):
+        self.queryset = Service.objects.order_by('-name')
+        self.paginator = LargeTablePaginator(self.queryset, 3)
+
+    def page_names(self, number):
+        return [service.name for service in self.paginator.page(number)]
+
+    def test_count_and_page_range(self):
+        self.assertEqual(self.paginator.count, 7)
+        self.assertEqual(list(self.paginator.page_range), [1, 2, 3])
+
+    def test_pages_keep_queryset_order_at_the_boundaries(self):
+        names = list(self.queryset.values_list('name', flat=True))
+        self.assertEqual(self.page_names(1), names[0:3])
+        self.assertEqual(self.page_names(2), names[3:6])
+        self.assertEqual(self.page_names(3), names[6:7])
+
+    def test_page_is_one_pk_query_and_one_row_query(self):
+        self.paginator.count  # counted once, outside the page queries
+        with self.assertNumQueries(2):
+            self.page_names(2)
+
+    def test_last_page_indices(self):
+        page = self.paginator.page(3)
+        self.assertEqual((page.start_index(), page.end_index()), (7, 7))
+        self.assertFalse(page.has_next())
+
+    def test_empty_object_list(self):
+        paginator = LargeTablePaginator(Service.objects.none(), 3)
+        self.assertEqual(paginator.count, 0)
+        self.assertEqual(list(paginator.page(1)), [])
+
+
+class SlotAvailabilityCacheTests(TestCase):
+    """Appointment/DailySlots writes bump the cache version once the transaction commits"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = Service.objects.create(name='Checkup', duration_minutes=30)
+        cls.day = next_bookable_date()
+        DailySlots.objects.create(date=cls.day, am_slots=3, pm_slots=3)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_availability(self):
+        return self.client.get(reverse('appointments:slot_availability_api'), {
+            'start_date': self.day.isoformat(), 'end_date': self.day.isoformat(),
+        }).json()['availability'][self.day.isoformat()]
+
+    def test_bump_changes_cache_key(self):
+        key = slot_availability_cache_key('a', 'b')
+        bump_slot_availability_version()
+        self.assertNotEqual(slot_availability_cache_key('a', 'b'), key)
+
+    def test_bump_recovers_from_evicted_version(self):
+        slot_availability_cache_key('a')
+        cache.delete(SLOT_AVAILABILITY_VERSION_KEY)
+        bump_slot_availability_version()
+        self.assertEqual(cache.get(SLOT_AVAILABILITY_VERSION_KEY), 1)
+
+    def test_version_bumps_only_on_commit(self):
+        key = slot_availability_cache_key('a')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            DailySlots.objects.filter(date=self.day).first().save()
+            self.assertEqual(slot_availability_cache_key('a'), key)
+        self.assertTrue(callbacks)
+        self.assertNotEqual(slot_availability_cache_key('a'), key)
+
+    def test_new_appointment_invalidates_cached_response(self):
+        self.assertEqual(self.get_availability()['am_slots']['available'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                service=self.service,
+                appointment_date=self.day,
+                period='AM',
+                status='confirmed',
+                temp_first_name='Walk',
+                temp_last_name='In',
+                temp_email='walk.in@example.com',
+            )
+
+        self.assertEqual(self.get_availability()['am_slots']['available'], 2)
+
+    def test_response_is_cached_until_version_bump(self):
+        self.get_availability()
+        # queryset.update() sends no signals, so the version (and cached entry) stays
+        DailySlots.objects.filter(date=self.day).update(am_slots=1)
+        self.assertEqual(self.get_availability()['am_slots']['total'], 3)
+
+
+class BookAppointmentJsonTests(TestCase):
+    """JSON booking submissions are size-checked, type-checked and answered with JSON errors"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = Service.objects.create(name='Cleaning', duration_minutes=30)
+        cls.day = next_bookable_date()
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('core:book_appointment')
+
+    def booking_data(self, **overrides):
+        data = {
+            'patient_type': 'new',
+            'service': self.service.pk,
+            'appointment_date': self.day.isoformat(),
+            'period': 'AM',
+            'agreed_to_terms': True,
+            'first_name': 'Ana',
+            'last_name': 'Cruz',
+            'email': 'ana@example.com',
+            'contact_number': '0917 123 4567',
+        }
+        data.update(overrides)
+        return data
+
+    def post_json(self, body, **extra):
+        if not isinstance(body, (str, bytes)):
+            body = json.dumps(body)
+        return self.client.post(self.url, body, content_type='application/json', **extra)
+
+    def assertError(self, response, status, message):
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response.json(), {'success': False, 'error': message})
+
+    def test_valid_booking_creates_pending_appointment(self):
+        response = self.post_json(self.booking_data())
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertTrue(payload['success'])
+        appointment = Appointment.objects.get(pk=payload['appointment_id'])
+        self.assertEqual(payload['reference_number'], f'APT-{appointment.pk:06d}')
+        self.assertEqual(appointment.status, 'pending')
+        self.assertEqual(appointment.temp_contact_number, '09171234567')
+
+    def test_oversized_payload_is_rejected_before_parsing(self):
+        body = json.dumps(self.booking_data(reason='x' * MAX_BOOKING_PAYLOAD_BYTES))
+        self.assertError(self.post_json(body), 413, 'Payload too large')
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_malformed_content_length_is_rejected(self):
+        response = self.post_json(self.booking_data(), CONTENT_LENGTH='abc')
+        self.assertError(response, 400, 'Invalid Content-Length header')
+
+    def test_invalid_json_is_rejected(self):
+        for body in ['{not json', '[]', '"text"']:
+            with self.subTest(body=body):
+                self.assertError(self.post_json(body), 400, 'Invalid JSON data')
+
+    def test_non_string_fields_are_rejected(self):
+        for field, value in [('appointment_date', 20261103), ('period', ['AM']), ('email', {'a': 1})]:
+            with self.subTest(field=field):
+                response = self.post_json(self.booking_data(**{field: value}))
+                self.assertError(response, 400, f'{field} must be a string')
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_booking_errors_are_returned_as_json(self):
+        cases = [
+            ({'service': 999999}, 'Invalid service selected'),
+            ({'appointment_date': '20261103'}, 'Invalid date format'),
+            ({'period': 'EVENING'}, 'Invalid period. Must be AM or PM'),
+            ({'patient_type': 'guest'}, 'Invalid patient type'),
+            ({'email': 'not-an-email'}, 'Please enter a valid email address'),
+        ]
+        for overrides, message in cases:
+            with self.subTest(overrides=overrides):
+                self.assertError(self.post_json(self.booking_data(**overrides)), 400, message)
+        self.assertFalse(Appointment.objects.exists())
@@ -0,0 +1,231 @@
+# core/utils.py
+import csv
+import json
+import re
+from datetime import date
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is used when missing
+    orjson = None
+
+
+def json_loads(data):
+    """Parse a JSON request body (bytes or str), using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj):
+    """Serialize obj to a JSON string, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
+
+ISO_DATE_RE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
+
+
+def parse_iso_date(value):
+    """
+    Parse a strict YYYY-MM-DD string, raising ValueError for anything else
+
+    date.fromisoformat is much cheaper than strptime, but since Python 3.11 it
+    also takes other ISO 8601 spellings ('20261103', '2026-W45-2'), so the
+    shape is checked first to keep the accepted format unchanged.
+    """
+    if not ISO_DATE_RE.fullmatch(value):
+        raise ValueError(f'Invalid date {value!r}, expected YYYY-MM-DD')
+    return date.fromisoformat(value)
+
+
+def _orjson_default(obj):
+    # orjson handles dates natively; match DjangoJSONEncoder for the rest (Decimal etc.)
+    return DjangoJSONEncoder().default(obj)
+
+
+class OrjsonResponse(HttpResponse):
+    """
+    Drop-in for JsonResponse that encodes with orjson when it is installed
+    and falls back to DjangoJSONEncoder otherwise.
+    """
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        if orjson is not None:
+            content = orjson.dumps(data, default=_orjson_default)
+        else:
+            content = json.dumps(data, cls=DjangoJSONEncoder)
+        super().__init__(content=content, **kwargs)
+
+
+def count_many(**querysets):
+    """
+    Count several querysets in a single database round-trip
+
+    Each queryset is compiled into a scalar COUNT(*) subquery and all of them
+    are selected together, e.g. count_many(patients=qs1, dentists=qs2)
+    returns {'patients': 12, 'dentists': 3}.
+    """
+    columns = []
+    params = []
+    for queryset in querysets.values():
+        sql, query_params = queryset.order_by().values('pk').query.sql_with_params()
+        columns.append(f'(SELECT COUNT(*) FROM ({sql}) AS counted)')
+        params.extend(query_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(columns), params)
+        row = cursor.fetchone()
+
+    return dict(zip(querysets.keys(), row))
+
+
+class LargeTablePaginator(Paginator):
+    """
+    Paginator for big append-only tables such as the audit log
+
+    Each page first reads just the primary keys at the requested offset
+    (served from the ordering index), then loads the full rows for those
+    keys, so deep pages don't drag every skipped row's wide columns through
+    the OFFSET. On PostgreSQL an unfiltered listing is counted from the
+    planner's row estimate instead of a full COUNT(*).
+    """
+    ESTIMATE_THRESHOLD = 100000
+
+    @cached_property
+    def count(self):
+        if connection.vendor == 'postgresql' and not self.object_list.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                    [self.object_list.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            # reltuples is -1 (or missing) until the table has been analyzed
+            if row and row[0] >= self.ESTIMATE_THRESHOLD:
+                return row[0]
+        return super().count
+
+    def _get_page(self, object_list, *args, **kwargs):
+        page_pks = list(object_list.values_list('pk', flat=True))
+        rows = list(self.object_list.filter(pk__in=page_pks)) if page_pks else []
+        return super()._get_page(rows, *args, **kwargs)
+
+
+class _Echo:
+    """File-like object whose write() hands the CSV line straight back"""
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows):
+    """
+    Stream rows to the client as a CSV attachment without buffering the file
+
+    rows can be any iterable (e.g. queryset.iterator()), so only one database
+    chunk is held in memory at a time.
+    """
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# Public catalog cache - core.signals rebuilds/drops entries when a Service changes
+PUBLIC_CACHE_TIMEOUT = 300
+HOME_SERVICES_CACHE_KEY = 'home_services'
+SERVICES_JSON_CACHE_KEY = 'book_services_json'
+SERVICE_CACHE_TIMEOUT = 3600
+
+
+def service_cache_key(pk):
+    return f'svc:{pk}'
+
+
+def get_bookable_service(pk):
+    """
+    Cached {'id', 'name', 'duration_minutes'} row for a non-archived Service,
+    or None if pk doesn't name one. Cleared by core.signals on Service writes.
+    """
+    from services.models import Service
+
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    return cache.get_or_set(
+        service_cache_key(pk),
+        lambda: Service.objects.filter(id=pk, is_archived=False).values('id', 'name', 'duration_minutes').first(),
+        SERVICE_CACHE_TIMEOUT
+    )
+
+
+def build_services_json():
+    """Serialize the active service catalog for the booking form"""
+    from services.models import Service
+
+    services = []
+    rows = Service.objects.filter(is_archived=False).order_by('name').values(
+        'id', 'name', 'duration_minutes', 'min_price', 'max_price', 'description'
+    )
+    for service in rows:
+        if service['min_price'] is not None and service['max_price'] is not None:
+            price_range = f"₱{service['min_price']:,.0f} - ₱{service['max_price']:,.0f}"
+        else:
+            price_range = "Contact clinic for pricing"
+        services.append({
+            'id': service['id'],
+            'name': service['name'],
+            'duration_minutes': service['duration_minutes'] or 30,
+            'price_range': price_range,
+            'description': service['description'] or "Professional dental service"
+        })
+    return json_dumps(services)
+
+
+# System settings page context and maintenance hub counts - dropped by
+# core.signals on any change to the counted models
+SYSTEM_SETTINGS_CACHE_TIMEOUT = 60
+SYSTEM_SETTINGS_CACHE_KEY = 'systemsettings:ctx'
+MAINTENANCE_STATS_CACHE_KEY = 'maintenance_stats'
+
+
+# Public slot availability API - core.signals bumps the version whenever an
+# Appointment or DailySlots row changes, orphaning every cached range at once.
+# The bump only reaches other worker processes through a shared cache backend
+# (CACHES pointing at Redis/Memcached); with the default per-process
+# LocMemCache other workers can serve counts up to SLOT_AVAILABILITY_CACHE_TIMEOUT old.
+SLOT_AVAILABILITY_CACHE_TIMEOUT = 60
+SLOT_AVAILABILITY_VERSION_KEY = 'slotavail:version'
+
+
+def slot_availability_cache_key(*parts):
+    version = cache.get_or_set(SLOT_AVAILABILITY_VERSION_KEY, 1, None)
+    return 'slotavail:{}:{}'.format(version, ':'.join(str(part) for part in parts))
+
+
+def bump_slot_availability_version():
+    try:
+        cache.incr(SLOT_AVAILABILITY_VERSION_KEY)
+    except ValueError:  # key evicted or never set
+        cache.set(SLOT_AVAILABILITY_VERSION_KEY, 1, None)
+
+
+# Audit log "Module" filter options - new model names only appear when a new
+# kind of record is first logged, so a plain TTL is enough
+AUDIT_MODEL_CHOICES_CACHE_KEY = 'auditlog_model_choices'
+AUDIT_MODEL_CHOICES_CACHE_TIMEOUT = 600
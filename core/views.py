@@ -5,31 +5,87 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views.generic import TemplateView, ListView
 from django.utils import timezone
-from django.db.models import Q
-from django.http import JsonResponse
-from datetime import datetime
+from django.utils.decorators import method_decorator
+from django.core.cache import cache
+from datetime import datetime, time, timedelta
 from django.db import transaction
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError as DjangoValidationError
 import re
-import pytz
+from zoneinfo import ZoneInfo
 
 from .models import AuditLog, SystemSetting
+from .utils import (
+    count_many, json_loads, parse_iso_date, stream_csv, OrjsonResponse, LargeTablePaginator, build_services_json, get_bookable_service,
+    PUBLIC_CACHE_TIMEOUT, HOME_SERVICES_CACHE_KEY, SERVICES_JSON_CACHE_KEY,
+    SYSTEM_SETTINGS_CACHE_TIMEOUT, SYSTEM_SETTINGS_CACHE_KEY, MAINTENANCE_STATS_CACHE_KEY,
+    AUDIT_MODEL_CHOICES_CACHE_KEY, AUDIT_MODEL_CHOICES_CACHE_TIMEOUT,
+)
 from appointments.models import Appointment, DailySlots
-from patients.models import Patient
+from patients.models import Patient, PH_MOBILE_RE, PHONE_SEPARATORS
 from services.models import Service
 from users.models import User
 
+MANILA_TZ = ZoneInfo('Asia/Manila')
+
+# Booking form validation, compiled once at import
+NAME_RE = re.compile(r"^[a-zA-Z\s\-']+$")
+MAX_BOOKING_PAYLOAD_BYTES = 4096
+# Booking payload fields that are stripped/parsed as text; anything else is a client error
+BOOKING_TEXT_FIELDS = (
+    'patient_type', 'appointment_date', 'period', 'reason', 'patient_identifier',
+    'first_name', 'last_name', 'email', 'contact_number', 'address',
+)
+
+# Static audit log filter options, resolved once at import
+AUDIT_ACTION_CHOICES = AuditLog.ACTION_CHOICES
+ACTION_CHOICES_MAP = dict(AUDIT_ACTION_CHOICES)
+
+# Dashboard quick actions, grouped by the module permission that unlocks them
+QUICK_ACTIONS = (
+    ('appointments', (
+        {'name': 'New Appointment', 'url': 'appointments:appointment_create', 'icon': 'calendar'},
+        {'name': 'View Calendar', 'url': 'appointments:appointment_calendar', 'icon': 'calendar-view'},
+    )),
+    ('patients', (
+        {'name': 'Add Patient', 'url': 'patients:patient_create', 'icon': 'user-plus'},
+        {'name': 'Find Patient', 'url': 'patients:find_patient', 'icon': 'search'},
+    )),
+    ('maintenance', (
+        {'name': 'Manage Users', 'url': 'users:user_list', 'icon': 'users'},
+        {'name': 'System Settings', 'url': 'core:system_settings', 'icon': 'settings'},
+    )),
+)
+
+class BookingError(Exception):
+    """Rejected booking request; carries the message and status sent back as JSON"""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
 class HomeView(TemplateView):
     """Public landing page"""
     template_name = 'core/home.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['services'] = Service.objects.filter(is_archived=False)[:6]
+        context['services'] = cache.get_or_set(
+            HOME_SERVICES_CACHE_KEY,
+            lambda: list(
+                Service.objects.filter(is_archived=False)
+                .only('id', 'name', 'description', 'duration_minutes', 'min_price', 'max_price')[:6]
+            ),
+            PUBLIC_CACHE_TIMEOUT
+        )
         context['dentists'] = User.objects.filter(is_active_dentist=True)
         return context
 
+
+# The booking POST commits once, from its own transaction.atomic() block; keep it
+# out of ATOMIC_REQUESTS so enabling that setting never nests a second transaction
+@method_decorator(transaction.non_atomic_requests, name='dispatch')
 class BookAppointmentView(TemplateView):
     """
     PUBLIC VIEW: Simplified appointment booking using AM/PM slots (NO dentist selection)
@@ -39,23 +95,15 @@ class BookAppointmentView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get services for booking form
-        services = []
-        for service in Service.objects.filter(is_archived=False).order_by('name'):
-            services.append({
-                'id': service.id,
-                'name': service.name,
-                'duration_minutes': service.duration_minutes if hasattr(service, 'duration_minutes') else 30,
-                'price_range': f"₱{service.min_price:,.0f} - ₱{service.max_price:,.0f}" if hasattr(service, 'min_price') else "Contact clinic for pricing",
-                'description': service.description or "Professional dental service"
-            })
+        # Get services for booking form (already serialized, cached until a Service changes)
+        services_json = cache.get_or_set(SERVICES_JSON_CACHE_KEY, build_services_json, PUBLIC_CACHE_TIMEOUT)
         
         # Get period descriptions (configurable in future)
         am_period_display = SystemSetting.get_setting('am_period_display', '8:00 AM - 12:00 PM')
         pm_period_display = SystemSetting.get_setting('pm_period_display', '1:00 PM - 6:00 PM')
         
         context.update({
-            'services_json': json.dumps(services),
+            'services_json': services_json,
             'am_period_display': am_period_display,
             'pm_period_display': pm_period_display,
         })
@@ -64,25 +112,26 @@ class BookAppointmentView(TemplateView):
     
     def post(self, request, *args, **kwargs):
         """Handle appointment booking submission - UPDATED for AM/PM slots"""
+        # Check if request is JSON
+        if request.content_type != 'application/json':
+            return self._handle_form_request(request)
+        
+        # A booking is a few hundred bytes; refuse oversized bodies before parsing
         try:
-            # Check if request is JSON
-            if request.content_type == 'application/json':
-                data = json.loads(request.body)
-                return self._handle_json_request(data)
-            else:
-                return self._handle_form_request(request)
-                
-        except json.JSONDecodeError:
-            return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f'Error in BookAppointmentView: {str(e)}', exc_info=True)
-            
-            return JsonResponse({
-                'success': False, 
-                'error': 'An unexpected error occurred. Please try again.'
-            }, status=500)
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return OrjsonResponse({'success': False, 'error': 'Invalid Content-Length header'}, status=400)
+        if content_length > MAX_BOOKING_PAYLOAD_BYTES:
+            return OrjsonResponse({'success': False, 'error': 'Payload too large'}, status=413)
+        try:
+            data = json_loads(request.body)
+        except json.JSONDecodeError:  # also raised by orjson
+            return OrjsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+        if not isinstance(data, dict):
+            return OrjsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+        
+        # Unexpected errors are logged once, inside _handle_json_request
+        return self._handle_json_request(data)
     
     def _handle_json_request(self, data):
         """Handle JSON appointment request - UPDATED to skip automatic audit log"""
@@ -90,50 +139,53 @@ class BookAppointmentView(TemplateView):
         required_fields = ['patient_type', 'service', 'appointment_date', 'period']
         for field in required_fields:
             if not data.get(field):
-                return JsonResponse({'success': False, 'error': f'{field} is required'}, status=400)
+                return OrjsonResponse({'success': False, 'error': f'{field} is required'}, status=400)
         
         # Validate terms agreement
         if not data.get('agreed_to_terms'):
-            return JsonResponse({'success': False, 'error': 'You must agree to the terms and conditions'}, status=400)
+            return OrjsonResponse({'success': False, 'error': 'You must agree to the terms and conditions'}, status=400)
         
         try:
+            # Validate everything that needs no lock before opening the transaction
+            for field in BOOKING_TEXT_FIELDS:
+                if field in data and not isinstance(data[field], str):
+                    raise BookingError(f'{field} must be a string')
+            
+            # Get and validate service (cached row, no model instance needed)
+            service = get_bookable_service(data['service'])
+            if not service:
+                raise BookingError('Invalid service selected')
+            
+            # Parse and validate appointment date
+            try:
+                appointment_date = parse_iso_date(data['appointment_date'])
+            except ValueError:
+                raise BookingError('Invalid date format')
+            
+            # Validate period
+            period = data.get('period')
+            if period not in ['AM', 'PM']:
+                raise BookingError('Invalid period. Must be AM or PM')
+            
+            # Validate appointment date/period constraints
+            self._validate_appointment_datetime(appointment_date, period, today=timezone.localdate())
+            
+            # Handle patient data - UPDATED to store in temp fields
+            patient_data, patient_type = self._prepare_patient_data(data)
+            
             with transaction.atomic():
-                # Get and validate service
-                try:
-                    service = Service.objects.get(id=data['service'], is_archived=False)
-                except Service.DoesNotExist:
-                    return JsonResponse({'success': False, 'error': 'Invalid service selected'}, status=400)
-                
-                # Parse and validate appointment date
-                try:
-                    appointment_date = datetime.strptime(data['appointment_date'], '%Y-%m-%d').date()
-                except ValueError:
-                    return JsonResponse({'success': False, 'error': 'Invalid date format'}, status=400)
-                
-                # Validate period
-                period = data.get('period')
-                if period not in ['AM', 'PM']:
-                    return JsonResponse({'success': False, 'error': 'Invalid period. Must be AM or PM'}, status=400)
-                
-                # Validate appointment date/period constraints
-                validation_error = self._validate_appointment_datetime(appointment_date, period)
-                if validation_error:
-                    return JsonResponse({'success': False, 'error': validation_error}, status=400)
+                # Lock the date's slots row so two requests can't both take the last slot
+                DailySlots.lock_for_date(appointment_date)
                 
                 # Check slot availability
                 can_book, availability_message = Appointment.can_book_appointment(appointment_date, period)
                 if not can_book:
-                    return JsonResponse({'success': False, 'error': availability_message}, status=400)
-                
-                # Handle patient data - UPDATED to store in temp fields
-                patient_data, patient_type = self._prepare_patient_data(data)
-                if isinstance(patient_data, JsonResponse):  # Error response
-                    return patient_data
+                    raise BookingError(availability_message)
                 
                 # Create appointment with temp patient data
-                appointment = Appointment.objects.create(
+                appointment = Appointment(
                     patient=patient_data.get('existing_patient'),
-                    service=service,
+                    service_id=service['id'],
                     appointment_date=appointment_date,
                     period=period,
                     patient_type=patient_type,
@@ -150,26 +202,31 @@ class BookAppointmentView(TemplateView):
                 # (We don't want anonymous bookings cluttering the audit log)
                 # Staff will see it in the "Pending Requests" page
                 # When they approve it, that action will be logged
-                
-                # Generate reference number
-                reference_number = f'APT-{appointment.id:06d}'
-                
-                return JsonResponse({
-                    'success': True,
-                    'reference_number': reference_number,
-                    'appointment_id': appointment.id,
-                    'appointment_date': appointment_date.strftime('%Y-%m-%d'),
-                    'period': period,
-                    'period_display': 'Morning' if period == 'AM' else 'Afternoon',
-                    'patient_name': appointment.patient_name
-                })
+                appointment._skip_audit_log = True
+                appointment.save()
+            
+            # Generate reference number
+            reference_number = f'APT-{appointment.id:06d}'
+            
+            return OrjsonResponse({
+                'success': True,
+                'reference_number': reference_number,
+                'appointment_id': appointment.id,
+                'appointment_date': appointment_date.strftime('%Y-%m-%d'),
+                'period': period,
+                'period_display': 'Morning' if period == 'AM' else 'Afternoon',
+                'patient_name': appointment.patient_name
+            })
+        
+        except BookingError as e:
+            return OrjsonResponse({'success': False, 'error': e.message}, status=e.status)
                 
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f'Error in _handle_json_request: {str(e)}', exc_info=True)
             
-            return JsonResponse({
+            return OrjsonResponse({
                 'success': False, 
                 'error': 'An error occurred while processing your request. Please try again.'
             }, status=500)
@@ -183,7 +240,7 @@ class BookAppointmentView(TemplateView):
         elif patient_type_raw == 'existing':
             return self._prepare_existing_patient_data(data)
         else:
-            return JsonResponse({'success': False, 'error': 'Invalid patient type'}, status=400), None
+            raise BookingError('Invalid patient type')
 
     def _prepare_new_patient_data(self, data):
         """Prepare new patient data for temp storage"""
@@ -191,10 +248,7 @@ class BookAppointmentView(TemplateView):
         for field in required_new_fields:
             if not data.get(field, '').strip():
                 field_label = field.replace('_', ' ').title()
-                return JsonResponse({
-                    'success': False, 
-                    'error': f'{field_label} is required for new patients'
-                }, status=400), None
+                raise BookingError(f'{field_label} is required for new patients')
         
         # Extract and validate data
         first_name = data.get('first_name', '').strip()
@@ -204,38 +258,23 @@ class BookAppointmentView(TemplateView):
         address = data.get('address', '').strip()
         
         # Validate name fields
-        name_pattern = re.compile(r'^[a-zA-Z\s\-\']+$')
-        
-        if not name_pattern.match(first_name):
-            return JsonResponse({
-                'success': False,
-                'error': 'First name should only contain letters, spaces, hyphens, and apostrophes'
-            }, status=400), None
+        if not NAME_RE.match(first_name):
+            raise BookingError('First name should only contain letters, spaces, hyphens, and apostrophes')
         
-        if not name_pattern.match(last_name):
-            return JsonResponse({
-                'success': False,
-                'error': 'Last name should only contain letters, spaces, hyphens, and apostrophes'
-            }, status=400), None
+        if not NAME_RE.match(last_name):
+            raise BookingError('Last name should only contain letters, spaces, hyphens, and apostrophes')
         
         # Validate email format
         try:
             validate_email(email)
         except DjangoValidationError:
-            return JsonResponse({
-                'success': False,
-                'error': 'Please enter a valid email address'
-            }, status=400), None
+            raise BookingError('Please enter a valid email address')
         
         # Validate contact number if provided
         if contact_number:
-            phone_pattern = re.compile(r'^(\+63|0)?9\d{9}$')
-            clean_contact = contact_number.replace(' ', '').replace('-', '')
-            if not phone_pattern.match(clean_contact):
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Please enter a valid Philippine mobile number (e.g., +639123456789)'
-                }, status=400), None
+            clean_contact = contact_number.translate(PHONE_SEPARATORS)
+            if not PH_MOBILE_RE.match(clean_contact):
+                raise BookingError('Please enter a valid Philippine mobile number (e.g., +639123456789)')
             contact_number = clean_contact
         
         return {
@@ -251,23 +290,19 @@ class BookAppointmentView(TemplateView):
         """Prepare existing patient data - find and link existing patient"""
         identifier = data.get('patient_identifier', '').strip()
         if not identifier:
-            return JsonResponse({'success': False, 'error': 'Patient identifier is required'}, status=400), None
+            raise BookingError('Patient identifier is required')
         
         # Search logic
-        query = Q(is_active=True)
         if '@' in identifier:
-            query &= Q(email__iexact=identifier)
+            patients = Patient.lookup_active(email=identifier)
         else:
-            clean_identifier = identifier.replace(' ', '').replace('-', '')
-            query &= (Q(contact_number=identifier) | Q(contact_number=clean_identifier))
+            patients = Patient.lookup_active(contact_numbers=[Patient.normalize_phone(identifier)])
         
-        patient = Patient.objects.filter(query).first()
+        # Only the fields copied into the booking below are read
+        patient = patients.only('id', 'first_name', 'last_name', 'email', 'contact_number', 'address').first()
         
         if not patient:
-            return JsonResponse({
-                'success': False, 
-                'error': 'No patient found with the provided information. Please check your details or register as a new patient.'
-            }, status=400), None
+            raise BookingError('No patient found with the provided information. Please check your details or register as a new patient.')
         
         # For existing patients, we still store temp data in case there are updates
         # but we also link to the existing patient record
@@ -280,135 +315,22 @@ class BookAppointmentView(TemplateView):
             'existing_patient': patient  # Link to existing patient
         }, 'returning'
     
-    def _validate_appointment_datetime(self, appointment_date, period):
-        """Validate appointment date and period constraints - SIMPLIFIED (removed holiday check)"""
+    def _validate_appointment_datetime(self, appointment_date, period, today=None):
+        """Raise BookingError if the date/period can't be booked - SIMPLIFIED (removed holiday check)"""
+        if today is None:
+            today = timezone.localdate()
+        
         # Check past dates
-        if appointment_date <= timezone.now().date():
-            return 'Appointment date must be in the future'
+        if appointment_date <= today:
+            raise BookingError('Appointment date must be in the future')
         
         # Check Sundays
         if appointment_date.weekday() == 6:  # Sunday
-            return 'Appointments are not available on Sundays'
+            raise BookingError('Appointments are not available on Sundays')
         
         # Basic period validation
         if period not in ['AM', 'PM']:
-            return 'Invalid period selected'
-        
-        return None  # No validation errors
-    
-    def _handle_patient_data(self, data):
-        """Handle patient creation or finding with validation"""
-        patient_type_raw = data['patient_type']
-        
-        if patient_type_raw == 'new':
-            return self._create_new_patient(data)
-        elif patient_type_raw == 'existing':
-            return self._find_existing_patient(data)
-        else:
-            return JsonResponse({'success': False, 'error': 'Invalid patient type'}, status=400), None
-    
-    def _create_new_patient(self, data):
-        """Create new patient with validation"""
-        required_new_fields = ['first_name', 'last_name', 'email']
-        for field in required_new_fields:
-            if not data.get(field, '').strip():
-                field_label = field.replace('_', ' ').title()
-                return JsonResponse({
-                    'success': False, 
-                    'error': f'{field_label} is required for new patients'
-                }, status=400), None
-        
-        # Extract and validate data
-        first_name = data.get('first_name', '').strip()
-        last_name = data.get('last_name', '').strip()
-        email = data.get('email', '').strip()
-        contact_number = data.get('contact_number', '').strip()
-        address = data.get('address', '').strip()
-        
-        # Validate name fields
-        name_pattern = re.compile(r'^[a-zA-Z\s\-\']+$')
-        
-        if not name_pattern.match(first_name):
-            return JsonResponse({
-                'success': False,
-                'error': 'First name should only contain letters, spaces, hyphens, and apostrophes'
-            }, status=400), None
-        
-        if not name_pattern.match(last_name):
-            return JsonResponse({
-                'success': False,
-                'error': 'Last name should only contain letters, spaces, hyphens, and apostrophes'
-            }, status=400), None
-        
-        # Validate email format
-        try:
-            validate_email(email)
-        except DjangoValidationError:
-            return JsonResponse({
-                'success': False,
-                'error': 'Please enter a valid email address'
-            }, status=400), None
-        
-        # Validate contact number if provided
-        if contact_number:
-            phone_pattern = re.compile(r'^(\+63|0)?9\d{9}$')
-            clean_contact = contact_number.replace(' ', '').replace('-', '')
-            if not phone_pattern.match(clean_contact):
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Please enter a valid Philippine mobile number (e.g., +639123456789)'
-                }, status=400), None
-            contact_number = clean_contact
-        
-        # Check for existing patient
-        existing_query = Q()
-        if email:
-            existing_query |= Q(email__iexact=email, is_active=True)
-        if contact_number:
-            existing_query |= Q(contact_number=contact_number, is_active=True)
-        
-        if existing_query:
-            existing = Patient.objects.filter(existing_query).first()
-            if existing:
-                return JsonResponse({
-                    'success': False, 
-                    'error': 'A patient with this email or contact number already exists. Please use "Existing Patient" option.'
-                }, status=400), None
-        
-        # Create new patient
-        patient = Patient.objects.create(
-            first_name=first_name,
-            last_name=last_name,
-            email=email,
-            contact_number=contact_number or '',
-            address=address,
-        )
-        
-        return patient, 'new'
-    
-    def _find_existing_patient(self, data):
-        """Find existing patient with validation"""
-        identifier = data.get('patient_identifier', '').strip()
-        if not identifier:
-            return JsonResponse({'success': False, 'error': 'Patient identifier is required'}, status=400), None
-        
-        # Search logic
-        query = Q(is_active=True)
-        if '@' in identifier:
-            query &= Q(email__iexact=identifier)
-        else:
-            clean_identifier = identifier.replace(' ', '').replace('-', '')
-            query &= (Q(contact_number=identifier) | Q(contact_number=clean_identifier))
-        
-        patient = Patient.objects.filter(query).first()
-        
-        if not patient:
-            return JsonResponse({
-                'success': False, 
-                'error': 'No patient found with the provided information. Please check your details or register as a new patient.'
-            }, status=400), None
-        
-        return patient, 'returning'
+            raise BookingError('Invalid period selected')
     
     def _handle_form_request(self, request):
         """Handle regular form submission (fallback)"""
@@ -416,117 +338,6 @@ class BookAppointmentView(TemplateView):
         return redirect('core:book_appointment')
 
 
-# Add new API endpoints for AM/PM slot availability
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
-from django.views.decorators.csrf import csrf_exempt
-
-
-@require_http_methods(["GET"])
-def get_slot_availability_api(request):
-    """
-    API ENDPOINT: Get AM/PM slot availability for date range
-    Used by the booking calendar
-    """
-    start_date_str = request.GET.get('start_date')
-    end_date_str = request.GET.get('end_date', start_date_str)  # Default to same date if not provided
-    
-    if not start_date_str:
-        return JsonResponse({'error': 'start_date is required'}, status=400)
-    
-    try:
-        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-    except ValueError:
-        return JsonResponse({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
-    
-    # Validate date range
-    today = timezone.now().date()
-    if start_date <= today:
-        return JsonResponse({'error': 'Start date must be in the future'}, status=400)
-    
-    if end_date < start_date:
-        return JsonResponse({'error': 'End date must be after start date'}, status=400)
-    
-    # Limit range to prevent excessive queries
-    if (end_date - start_date).days > 90:
-        return JsonResponse({'error': 'Date range too large. Maximum 90 days.'}, status=400)
-    
-    # Get availability for date range
-    availability = DailySlots.get_availability_for_range(start_date, end_date)
-    
-    # Format for frontend
-    formatted_availability = {}
-    for date_obj, slots in availability.items():
-        date_str = date_obj.strftime('%Y-%m-%d')
-        
-        # Skip Sundays and past dates
-        if date_obj.weekday() == 6 or date_obj <= today:
-            continue
-        
-        formatted_availability[date_str] = {
-            'date': date_str,
-            'weekday': date_obj.strftime('%A'),
-            'am_slots': {
-                'available': slots['am_available'],
-                'total': slots['am_total'],
-                'is_available': slots['am_available'] > 0
-            },
-            'pm_slots': {
-                'available': slots['pm_available'],
-                'total': slots['pm_total'],
-                'is_available': slots['pm_available'] > 0
-            },
-            'has_availability': (slots['am_available'] > 0 or slots['pm_available'] > 0)
-        }
-    
-    return JsonResponse({
-        'availability': formatted_availability,
-        'date_range': {
-            'start': start_date_str,
-            'end': end_date_str
-        }
-    })
-
-
-@require_http_methods(["GET"])
-def find_patient_api(request):
-    """
-    API ENDPOINT: Find existing patient by email or contact number
-    """
-    identifier = request.GET.get('identifier', '').strip()
-    if not identifier or len(identifier) < 3:
-        return JsonResponse({'found': False})
-    
-    # Search logic
-    query = Q(is_active=True)
-    
-    if '@' in identifier:
-        query &= Q(email__iexact=identifier)
-    else:
-        # Handle contact number with flexible formatting
-        clean_identifier = identifier.replace(' ', '').replace('-', '').replace('+', '')
-        query &= (
-            Q(contact_number=identifier) | 
-            Q(contact_number=clean_identifier) |
-            (Q(contact_number__endswith=clean_identifier[-10:]) if len(clean_identifier) >= 10 else Q())
-        )
-    
-    patient = Patient.objects.filter(query).first()
-    
-    if patient:
-        return JsonResponse({
-            'found': True,
-            'patient': {
-                'id': patient.id,
-                'name': patient.full_name,
-                'email': patient.email or '',
-                'contact_number': patient.contact_number or ''
-            }
-        })
-    else:
-        return JsonResponse({'found': False})
-
 class DashboardView(LoginRequiredMixin, TemplateView):
     """Main dashboard for authenticated users - UPDATED for AM/PM system with Manila timezone"""
     template_name = 'core/dashboard.html'
@@ -535,44 +346,51 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         
         # Get today's date in Manila timezone
-        manila_tz = pytz.timezone('Asia/Manila')
-        manila_now = timezone.now().astimezone(manila_tz)
-        today = manila_now.date()
+        today = timezone.now().astimezone(MANILA_TZ).date()
         
         # Today's appointments - Use BLOCKING_STATUSES for consistency
-        todays_appointments = Appointment.objects.filter(
+        # Evaluated once here so the template loop and the count below share
+        # a single query (served by the appointment_date/period index)
+        todays_appointments = list(Appointment.objects.filter(
             appointment_date=today,
             status__in=Appointment.BLOCKING_STATUSES
-        ).select_related('patient', 'assigned_dentist', 'service').order_by('period', 'requested_at')
-        
+        ).select_related('patient', 'assigned_dentist', 'service').only(
+            # Just what the dashboard table renders
+            'id', 'period', 'status', 'patient_type', 'requested_at', 'temp_first_name', 'temp_last_name',
+            'patient__first_name', 'patient__last_name', 'service__name',
+            'assigned_dentist__first_name', 'assigned_dentist__last_name',
+        ).order_by('period', 'requested_at'))
+
         context['todays_appointments'] = todays_appointments
         
-        # Pending appointment requests
-        context['pending_requests'] = Appointment.objects.filter(
-            status='pending'
-        ).count()
-        
         # Recent patients
         context['recent_patients'] = Patient.objects.filter(
             is_active=True
-        ).order_by('-created_at')[:5]
-        
-        # Statistics
+        ).only('id', 'first_name', 'last_name', 'email', 'contact_number', 'created_at').order_by('-created_at')[:5]
+
+        # Statistics - all counters fetched in one round-trip
+        counts = count_many(
+            pending_requests=Appointment.objects.filter(status='pending'),
+            total_patients=Patient.objects.filter(is_active=True),
+            active_dentists=User.objects.filter(is_active_dentist=True),
+        )
+        context['pending_requests'] = counts['pending_requests']
         context['stats'] = {
-            'total_patients': Patient.objects.filter(is_active=True).count(),
-            'todays_appointments_count': todays_appointments.count(),
-            'pending_requests_count': context['pending_requests'],
-            'active_dentists': User.objects.filter(is_active_dentist=True).count(),
+            'total_patients': counts['total_patients'],
+            'todays_appointments_count': len(todays_appointments),
+            'pending_requests_count': counts['pending_requests'],
+            'active_dentists': counts['active_dentists'],
         }
         
         # Today's slot availability summary with percentage calculations
-        try:
-            daily_slots = DailySlots.objects.get(date=today)
-            
-            # Calculate availability
-            am_available = daily_slots.get_available_am_slots()
+        daily_slots, created = DailySlots.get_or_create_for_date(today)
+        if daily_slots:
+            # todays_appointments already holds every slot-blocking booking for today
+            booked_am = sum(1 for appointment in todays_appointments if appointment.period == 'AM')
+            booked_pm = len(todays_appointments) - booked_am
+            am_available = max(0, daily_slots.am_slots - booked_am)
             am_total = daily_slots.am_slots
-            pm_available = daily_slots.get_available_pm_slots()
+            pm_available = max(0, daily_slots.pm_slots - booked_pm)
             pm_total = daily_slots.pm_slots
             
             # Calculate percentages
@@ -587,63 +405,27 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                 'pm_total': pm_total,
                 'pm_percentage': round(pm_percentage, 1),
             }
-            
-        except DailySlots.DoesNotExist:
-            # Try to create default slots for today
-            daily_slots, created = DailySlots.get_or_create_for_date(today)
-            if daily_slots:
-                am_available = daily_slots.get_available_am_slots()
-                am_total = daily_slots.am_slots
-                pm_available = daily_slots.get_available_pm_slots()
-                pm_total = daily_slots.pm_slots
-                
-                am_percentage = (am_available / am_total * 100) if am_total > 0 else 0
-                pm_percentage = (pm_available / pm_total * 100) if pm_total > 0 else 0
-                
-                context['todays_slot_summary'] = {
-                    'am_available': am_available,
-                    'am_total': am_total,
-                    'am_percentage': round(am_percentage, 1),
-                    'pm_available': pm_available,
-                    'pm_total': pm_total,
-                    'pm_percentage': round(pm_percentage, 1),
-                }
-            else:
-                context['todays_slot_summary'] = {
-                    'am_available': 0,
-                    'am_total': 0,
-                    'am_percentage': 0,
-                    'pm_available': 0,
-                    'pm_total': 0,
-                    'pm_percentage': 0,
-                }
+        else:
+            context['todays_slot_summary'] = {
+                'am_available': 0,
+                'am_total': 0,
+                'am_percentage': 0,
+                'pm_available': 0,
+                'pm_total': 0,
+                'pm_percentage': 0,
+            }
         
         return context
     
     def get_quick_actions(self):
         """Get quick actions based on user permissions"""
-        actions = []
         user = self.request.user
-        
-        if user.has_permission('appointments'):
-            actions.extend([
-                {'name': 'New Appointment', 'url': 'appointments:appointment_create', 'icon': 'calendar'},
-                {'name': 'View Calendar', 'url': 'appointments:appointment_calendar', 'icon': 'calendar-view'},
-            ])
-        
-        if user.has_permission('patients'):
-            actions.extend([
-                {'name': 'Add Patient', 'url': 'patients:patient_create', 'icon': 'user-plus'},
-                {'name': 'Find Patient', 'url': 'patients:find_patient', 'icon': 'search'},
-            ])
-        
-        if user.has_permission('maintenance'):
-            actions.extend([
-                {'name': 'Manage Users', 'url': 'users:user_list', 'icon': 'users'},
-                {'name': 'System Settings', 'url': 'core:system_settings', 'icon': 'settings'},
-            ])
-        
-        return actions
+        return [
+            action
+            for module_name, module_actions in QUICK_ACTIONS
+            if user.has_permission(module_name)
+            for action in module_actions
+        ]
 
 class AuditLogListView(LoginRequiredMixin, ListView):
     """Enhanced view for audit logs with comprehensive filtering"""
@@ -651,6 +433,7 @@ class AuditLogListView(LoginRequiredMixin, ListView):
     template_name = 'core/audit_log_list.html'
     context_object_name = 'logs'
     paginate_by = 50
+    paginator_class = LargeTablePaginator
     
     def dispatch(self, request, *args, **kwargs):
         if not request.user.has_permission('maintenance'):
@@ -659,7 +442,12 @@ class AuditLogListView(LoginRequiredMixin, ListView):
         return super().dispatch(request, *args, **kwargs)
     
     def get_queryset(self):
-        queryset = AuditLog.objects.select_related('user').order_by('-timestamp')
+        # Only the columns the list template renders (user_agent etc. stay deferred)
+        queryset = AuditLog.objects.select_related('user').only(
+            'id', 'timestamp', 'action', 'model_name', 'object_repr', 'description',
+            'changes', 'ip_address', 'user__id', 'user__username',
+            'user__first_name', 'user__last_name',
+        ).order_by('-timestamp', '-id')
         
         # Build active filters list for display
         self.active_filters = []
@@ -679,7 +467,7 @@ class AuditLogListView(LoginRequiredMixin, ListView):
         action_filter = self.request.GET.get('action')
         if action_filter:
             queryset = queryset.filter(action=action_filter)
-            action_display = dict(AuditLog.ACTION_CHOICES).get(action_filter, action_filter)
+            action_display = ACTION_CHOICES_MAP.get(action_filter, action_filter)
             self.active_filters.append(f"Action: {action_display}")
         
         # Filter by model name
@@ -694,33 +482,77 @@ class AuditLogListView(LoginRequiredMixin, ListView):
         
         if date_from:
             try:
-                date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-                queryset = queryset.filter(timestamp__date__gte=date_from_obj)
+                date_from_obj = parse_iso_date(date_from)
+                # Half-open datetime range keeps the timestamp index usable
+                queryset = queryset.filter(
+                    timestamp__gte=timezone.make_aware(datetime.combine(date_from_obj, time.min))
+                )
                 self.active_filters.append(f"From: {date_from_obj.strftime('%b %d, %Y')}")
             except ValueError:
                 pass
         
         if date_to:
             try:
-                date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-                queryset = queryset.filter(timestamp__date__lte=date_to_obj)
+                date_to_obj = parse_iso_date(date_to)
+                queryset = queryset.filter(
+                    timestamp__lt=timezone.make_aware(datetime.combine(date_to_obj + timedelta(days=1), time.min))
+                )
                 self.active_filters.append(f"To: {date_to_obj.strftime('%b %d, %Y')}")
             except ValueError:
                 pass
         
         return queryset
     
+    def get(self, request, *args, **kwargs):
+        if request.GET.get('export') == 'csv':
+            return self.export_csv(self.get_queryset())
+        return super().get(request, *args, **kwargs)
+    
+    def export_csv(self, queryset):
+        """Stream the filtered audit log as CSV, reading rows in chunks"""
+        action_labels = ACTION_CHOICES_MAP
+        rows = queryset.values_list(
+            'timestamp', 'user__username', 'ip_address', 'action',
+            'model_name', 'object_repr', 'description',
+        ).iterator(chunk_size=500)
+        
+        def format_rows():
+            for timestamp, username, ip_address, action, model_name, object_repr, description in rows:
+                yield [
+                    timezone.localtime(timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+                    username or 'Anonymous',
+                    ip_address or '',
+                    action_labels.get(action, action),
+                    model_name,
+                    object_repr,
+                    description,
+                ]
+        
+        return stream_csv(
+            'audit_logs.csv',
+            ['Timestamp', 'User', 'IP Address', 'Action', 'Module', 'Object', 'Description'],
+            format_rows()
+        )
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
         # Get all users for filter dropdown
-        context['users'] = User.objects.filter(is_active=True).order_by('first_name', 'last_name')
+        context['users'] = list(
+            User.objects.filter(is_active=True)
+            .order_by('first_name', 'last_name')
+            .values('id', 'first_name', 'last_name', 'username')
+        )
         
         # Action choices
-        context['action_choices'] = AuditLog.ACTION_CHOICES
+        context['action_choices'] = AUDIT_ACTION_CHOICES
         
         # Get unique model names for filter
-        context['model_choices'] = AuditLog.objects.values_list('model_name', flat=True).distinct().order_by('model_name')
+        context['model_choices'] = cache.get_or_set(
+            AUDIT_MODEL_CHOICES_CACHE_KEY,
+            lambda: list(AuditLog.objects.values_list('model_name', flat=True).distinct().order_by('model_name')),
+            AUDIT_MODEL_CHOICES_CACHE_TIMEOUT
+        )
         
         # Current filters
         context['filters'] = {
@@ -734,8 +566,8 @@ class AuditLogListView(LoginRequiredMixin, ListView):
         # Active filters for display
         context['active_filters'] = getattr(self, 'active_filters', [])
         
-        # Total count
-        context['total_count'] = self.get_queryset().count()
+        # Total count - the paginator already counted the filtered queryset
+        context['total_count'] = context['paginator'].count
         
         return context
 
@@ -751,13 +583,20 @@ class MaintenanceHubView(LoginRequiredMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['stats'] = {
-            'users_count': User.objects.count(),
-            'services_count': Service.objects.count(),
-            'patients_count': Patient.objects.count(),
-            'appointments_count': Appointment.objects.count(),
-        }
+        context['stats'] = cache.get_or_set(
+            MAINTENANCE_STATS_CACHE_KEY, self._count_records, SYSTEM_SETTINGS_CACHE_TIMEOUT
+        )
         return context
+    
+    @staticmethod
+    def _count_records():
+        """All four table counts in one round-trip (cached, cleared by core.signals)"""
+        return count_many(
+            users_count=User.objects.all(),
+            services_count=Service.objects.all(),
+            patients_count=Patient.objects.all(),
+            appointments_count=Appointment.objects.all(),
+        )
 
 class SystemSettingsView(LoginRequiredMixin, TemplateView):
     """System settings management"""
@@ -771,16 +610,22 @@ class SystemSettingsView(LoginRequiredMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Get all system settings
-        settings = {}
-        for setting in SystemSetting.objects.all():
-            settings[setting.key] = setting.value
-        
-        context['settings'] = settings
-        context['stats'] = {
-            'total_appointments': Appointment.objects.count(),
-            'total_patients': Patient.objects.count(),
-            'total_services': Service.objects.count(),
-            'total_users': User.objects.count(),
-        }
-        return context
\ No newline at end of file
+        context.update(
+            cache.get_or_set(SYSTEM_SETTINGS_CACHE_KEY, self._build_settings_context, SYSTEM_SETTINGS_CACHE_TIMEOUT)
+        )
+        return context
+    
+    @staticmethod
+    def _build_settings_context():
+        """Settings dict and record counts (cached, cleared by core.signals)"""
+        return {
+            # All system settings, key -> value straight from the rows
+            'settings': dict(SystemSetting.objects.values_list('key', 'value')),
+            # All four table counts in one round-trip
+            'stats': count_many(
+                total_appointments=Appointment.objects.all(),
+                total_patients=Patient.objects.all(),
+                total_services=Service.objects.all(),
+                total_users=User.objects.all(),
+            ),
+        }
\ No newline at end of file
@@ -1,10 +1,11 @@
 # patients/admin.py
 from django.contrib import admin
+from django.db.models import Count
 from .models import Patient, TreatmentNote
 
 @admin.register(Patient)
 class PatientAdmin(admin.ModelAdmin):
-    list_display = ['last_name', 'first_name', 'email', 'contact_number', 'is_active', 'created_at']
+    list_display = ['last_name', 'first_name', 'email', 'contact_number', 'note_count', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at', 'date_of_birth']
     search_fields = ['first_name', 'last_name', 'email', 'contact_number']
     readonly_fields = ['created_at', 'updated_at']
@@ -25,12 +26,17 @@ class PatientAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(note_count=Count('treatment_notes'))
+
+    @admin.display(description='Notes', ordering='note_count')
+    def note_count(self, obj):
+        return obj.note_count
+
 @admin.register(TreatmentNote)
 class TreatmentNoteAdmin(admin.ModelAdmin):
     list_display = ['patient', 'tooth_number', 'date_recorded', 'recorded_by']
     list_filter = ['date_recorded', 'recorded_by']
     search_fields = ['patient__first_name', 'patient__last_name', 'notes']
     readonly_fields = ['date_recorded']
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('patient', 'recorded_by')
\ No newline at end of file
+    list_select_related = ('patient', 'recorded_by')
\ No newline at end of file
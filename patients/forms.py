@@ -1,8 +1,10 @@
 # patients/forms.py
 from django import forms
 from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db.models.functions import Lower
 from datetime import date
-from .models import Patient
+from .models import Patient, PH_MOBILE_RE, PHONE_SEPARATORS
 
 
 def clean_philippine_phone_number(phone, field_name="phone number"):
@@ -26,22 +28,14 @@ def clean_philippine_phone_number(phone, field_name="phone number"):
     phone = phone.strip()
     if not phone:
         return ''
-        
-    # Remove spaces and dashes
-    phone = phone.replace(' ', '').replace('-', '')
-    
-    # Convert local format to international
-    if phone.startswith('09'):
-        phone = '+63' + phone[1:]
-    elif phone.startswith('9') and len(phone) == 10:
-        phone = '+63' + phone
     
-    # Validate format
-    if not phone.startswith('+63') or len(phone) != 13:
-        if not (phone.startswith('09') and len(phone) == 11):
-            raise ValidationError(f'Please enter a valid Philippine {field_name} (e.g., +639123456789 or 09123456789)')
+    # Drop spaces/dashes in one pass, then accept +639..., 09... or 9... and
+    # convert to international format
+    match = PH_MOBILE_RE.match(phone.translate(PHONE_SEPARATORS))
+    if not match:
+        raise ValidationError(f'Please enter a valid Philippine {field_name} (e.g., +639123456789 or 09123456789)')
     
-    return phone
+    return '+63' + match.group(1)
 
 
 class PatientForm(forms.ModelForm):
@@ -78,7 +72,6 @@ class PatientForm(forms.ModelForm):
             'date_of_birth': forms.DateInput(attrs={
                 'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-primary-500 focus:ring-primary-500',
                 'type': 'date',
-                'max': date.today().strftime('%Y-%m-%d')
             }),
         }
     
@@ -97,13 +90,17 @@ class PatientForm(forms.ModelForm):
         self.fields['contact_number'].label = 'Contact Number'
         self.fields['address'].label = 'Address'
         self.fields['date_of_birth'].label = 'Date of Birth'
+        
+        # Set per form instance; a class-level value would be frozen at import
+        self.fields['date_of_birth'].widget.attrs['max'] = date.today().isoformat()
     
     def clean_email(self):
         """Validate email uniqueness"""
         email = self.cleaned_data.get('email')
         if email:
             email = email.lower().strip()
-            queryset = Patient.objects.filter(email__iexact=email)
+            # Compare against LOWER(email) so patient_email_lower_idx serves the check
+            queryset = Patient.objects.annotate(email_lower=Lower('email')).filter(email_lower=email)
             if self.instance.pk:
                 queryset = queryset.exclude(pk=self.instance.pk)
             if queryset.exists():
@@ -119,12 +116,12 @@ class PatientForm(forms.ModelForm):
         """Validate date of birth"""
         dob = self.cleaned_data.get('date_of_birth')
         if dob:
-            if dob > date.today():
+            today = date.today()
+            if dob > today:
                 raise ValidationError('Date of birth cannot be in the future.')
             
             # Check if too old (e.g., over 120 years)
-            age = date.today().year - dob.year
-            if age > 120:
+            if today.year - dob.year > 120:
                 raise ValidationError('Please enter a valid date of birth.')
         
         return dob
@@ -199,13 +196,13 @@ class FindPatientForm(forms.Form):
         if '@' in identifier:
             # Looks like email
             try:
-                forms.EmailField().clean(identifier)
+                validate_email(identifier)
             except ValidationError:
                 raise ValidationError('Please enter a valid email address.')
         else:
-            # Assume it's a phone number - use utility function
+            # Assume it's a phone number - return it in the stored +63 form
             try:
-                clean_philippine_phone_number(identifier, "phone number")
+                identifier = clean_philippine_phone_number(identifier, "phone number")
             except ValidationError:
                 raise ValidationError('Please enter a valid phone number or email address.')
         
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 04:23
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='patient_email_lower_idx'),
+        ),
+    ]
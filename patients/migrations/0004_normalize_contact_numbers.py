@@ -0,0 +1,28 @@
+from django.db import migrations
+import re
+
+
+PH_MOBILE_RE = re.compile(r'^(?:\+?63|0)?(9\d{9})$')
+
+
+def normalize_contact_numbers(apps, schema_editor):
+    """Rewrite stored contact numbers into the form Patient.save() now produces"""
+    Patient = apps.get_model('patients', 'Patient')
+    for patient in Patient.objects.exclude(contact_number__isnull=True).exclude(contact_number='').only('id', 'contact_number'):
+        value = patient.contact_number.strip().replace(' ', '').replace('-', '')
+        match = PH_MOBILE_RE.match(value)
+        if match:
+            value = '+63' + match.group(1)
+        if value != patient.contact_number:
+            Patient.objects.filter(pk=patient.pk).update(contact_number=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0003_patient_email_lower_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_contact_numbers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-17 04:33
+
+from collections import defaultdict
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def check_active_email_duplicates(apps, schema_editor):
+    """
+    Refuse to add the constraint while active patients share an email.
+
+    Duplicates have to be merged or archived by staff first; the migration
+    lists them instead of picking a record to deactivate.
+    """
+    Patient = apps.get_model('patients', 'Patient')
+    pks_by_email = defaultdict(list)
+    rows = Patient.objects.filter(is_active=True).exclude(email='').order_by('pk').values_list('pk', 'email')
+    for pk, email in rows:
+        pks_by_email[email.lower()].append(pk)
+
+    duplicates = {email: pks for email, pks in pks_by_email.items() if len(pks) > 1}
+    if duplicates:
+        details = '; '.join(f'{email}: {pks}' for email, pks in sorted(duplicates.items()))
+        raise RuntimeError(
+            'Cannot add patient_active_email_unique: these active patients share an '
+            f'email address (email: patient ids): {details}. Merge or deactivate '
+            'the duplicates, then run migrate again.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0004_normalize_contact_numbers'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_active_email_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='patient',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('is_active', True), models.Q(('email', ''), _negated=True)), name='patient_active_email_unique'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+# Columns searched with __icontains by the patient list and search views
+TRGM_COLUMNS = ('first_name', 'last_name', 'email', 'contact_number')
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """GIN trigram indexes let PostgreSQL serve ILIKE '%term%'; other backends keep scanning"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in TRGM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS patient_{column}_trgm_idx '
+            f'ON patients_patient USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in TRGM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS patient_{column}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0005_patient_active_unique_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -1,8 +1,31 @@
 # patients/models.py
+import operator
+import re
+from datetime import date
+from functools import reduce
+
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.core.validators import RegexValidator
 
+# Philippine mobile number in any accepted local/international form; the one
+# definition used by patient, appointment and public booking validation
+PH_MOBILE_RE = re.compile(r'^(?:\+?63|0)?(9\d{9})$')
+PHONE_SEPARATORS = str.maketrans('', '', ' -')
+
+
+# Columns list pages render; address and date of birth stay unloaded
+PATIENT_LIST_FIELDS = ('id', 'first_name', 'last_name', 'email', 'contact_number', 'is_active', 'created_at')
+
+
+class PatientListManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().only(*PATIENT_LIST_FIELDS)
+
+
 class Patient(models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
@@ -20,13 +43,27 @@ class Patient(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     
+    objects = models.Manager()
+    list_objects = PatientListManager()
+    
     class Meta:
         ordering = ['last_name', 'first_name']
         indexes = [
             models.Index(fields=['email']),
+            models.Index(Lower('email'), name='patient_email_lower_idx'),
             models.Index(fields=['contact_number']),
             models.Index(fields=['last_name', 'first_name']),
         ]
+        constraints = [
+            # One active record per email; the DB enforces this even when two
+            # requests pass the duplicate check at the same time. Contact
+            # numbers stay shareable (family members on one mobile).
+            models.UniqueConstraint(
+                Lower('email'),
+                condition=Q(is_active=True) & ~Q(email=''),
+                name='patient_active_email_unique',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.last_name}, {self.first_name}"
@@ -34,17 +71,61 @@ class Patient(models.Model):
     def get_absolute_url(self):
         return reverse('patients:detail', kwargs={'pk': self.pk})
     
-    @property
+    def save(self, *args, **kwargs):
+        # Store contact numbers in one canonical form so lookups are a single equality
+        if self.contact_number:
+            self.contact_number = self.normalize_phone(self.contact_number)
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def normalize_phone(value):
+        """
+        Canonical form of a contact number: Philippine mobiles become
+        +639XXXXXXXXX, anything else just loses spaces and dashes.
+        """
+        if not value:
+            return ''
+        value = value.strip().translate(PHONE_SEPARATORS)
+        match = PH_MOBILE_RE.match(value)
+        if match:
+            return '+63' + match.group(1)
+        return value
+    
+    @classmethod
+    def lookup_active(cls, email='', contact_numbers=()):
+        """
+        Active patients matching an email (case-insensitive) or any of the given
+        contact numbers. Email is compared as LOWER(email) so the
+        patient_email_lower_idx index can be used.
+        """
+        clauses = []
+        if email:
+            clauses.append(Q(email_lower=email.lower()))
+        contact_numbers = [number for number in contact_numbers if number]
+        if contact_numbers:
+            # A single number becomes a plain equality rather than IN (...)
+            if len(contact_numbers) == 1:
+                clauses.append(Q(contact_number=contact_numbers[0]))
+            else:
+                clauses.append(Q(contact_number__in=contact_numbers))
+        
+        if not clauses:
+            return cls.objects.none()
+        return cls.objects.annotate(email_lower=Lower('email')).filter(
+            reduce(operator.or_, clauses), is_active=True
+        )
+    
+    # Cached per instance: list templates read full_name, age and is_minor on every row
+    @cached_property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
     
-    @property
+    @cached_property
     def age(self):
         """Calculate and return patient's age"""
         if not self.date_of_birth:
             return None
         
-        from datetime import date
         today = date.today()
         age = today.year - self.date_of_birth.year
         
@@ -54,34 +135,22 @@ class Patient(models.Model):
         
         return age
 
-    @property
+    @cached_property
     def is_minor(self):
         """Check if patient is under 18"""
-        if not self.date_of_birth:
-            return False
-        from datetime import date
-        today = date.today()
-        age = today.year - self.date_of_birth.year - (
-            (today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day)
-        )
-        return age < 18
+        return self.age is not None and self.age < 18
     
-    @property
+    @cached_property
     def contact_info(self):
         """Return available contact information"""
-        contacts = []
-        if self.email:
-            contacts.append(self.email)
-        if self.contact_number:
-            contacts.append(self.contact_number)
-        return " | ".join(contacts)
+        return " | ".join(filter(None, (self.email, self.contact_number)))
     
     def can_be_found_by(self, identifier):
         """Check if patient can be found by email or phone"""
-        return (
-            (self.email and self.email.lower() == identifier.lower()) or
-            (self.contact_number and self.contact_number == identifier)
-        )
+        if '@' in identifier:
+            return bool(self.email) and self.email.casefold() == identifier.casefold()
+        return bool(self.contact_number) and self.contact_number == self.normalize_phone(identifier)
+
 
 class TreatmentNote(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='treatment_notes')
@@ -8,9 +8,10 @@ from .models import Patient
 class PatientFormTests(TestCase):
     """Test cases for PatientForm"""
 
-    def setUp(self):
-        """Set up test data"""
-        self.valid_form_data = {
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data once for the class (copied per test by TestCase)"""
+        cls.valid_form_data = {
             'first_name': 'John',
             'last_name': 'Doe',
             'email': 'john.doe@example.com',
@@ -83,14 +84,16 @@ class PatientFormTests(TestCase):
             ('+639123456789', '+639123456789'), # Already international
             ('09-123-456-789', '+639123456789'), # With dashes
             ('0912 345 6789', '+639123456789'),  # With spaces
+            ('639123456789', '+639123456789'),   # Country code without plus
         ]
         
         for input_phone, expected_output in test_cases:
-            data = self.valid_form_data.copy()
-            data['contact_number'] = input_phone
-            form = PatientForm(data=data)
-            self.assertTrue(form.is_valid(), f"Form should be valid for {input_phone}. Errors: {form.errors}")
-            self.assertEqual(form.cleaned_data['contact_number'], expected_output)
+            with self.subTest(input_phone=input_phone):
+                data = self.valid_form_data.copy()
+                data['contact_number'] = input_phone
+                form = PatientForm(data=data)
+                self.assertTrue(form.is_valid(), f"Form errors: {form.errors}")
+                self.assertEqual(form.cleaned_data['contact_number'], expected_output)
 
     def test_emergency_phone_format_conversion(self):
         """Test emergency phone number format conversion"""
@@ -101,11 +104,12 @@ class PatientFormTests(TestCase):
         ]
         
         for input_phone, expected_output in test_cases:
-            data = self.valid_form_data.copy()
-            data['emergency_contact_phone'] = input_phone
-            form = PatientForm(data=data)
-            self.assertTrue(form.is_valid(), f"Form should be valid for {input_phone}")
-            self.assertEqual(form.cleaned_data['emergency_contact_phone'], expected_output)
+            with self.subTest(input_phone=input_phone):
+                data = self.valid_form_data.copy()
+                data['emergency_contact_phone'] = input_phone
+                form = PatientForm(data=data)
+                self.assertTrue(form.is_valid(), f"Form should be valid for {input_phone}")
+                self.assertEqual(form.cleaned_data['emergency_contact_phone'], expected_output)
 
     def test_invalid_phone_numbers(self):
         """Test invalid phone number formats"""
@@ -117,10 +121,11 @@ class PatientFormTests(TestCase):
         ]
         
         for invalid_phone in invalid_phones:
-            data = self.valid_form_data.copy()
-            data['contact_number'] = invalid_phone
-            form = PatientForm(data=data)
-            self.assertFalse(form.is_valid(), f"Form should be invalid for {invalid_phone}")
+            with self.subTest(invalid_phone=invalid_phone):
+                data = self.valid_form_data.copy()
+                data['contact_number'] = invalid_phone
+                form = PatientForm(data=data)
+                self.assertFalse(form.is_valid(), f"Form should be invalid for {invalid_phone}")
 
     def test_email_uniqueness(self):
         """Test email uniqueness validation"""
@@ -152,6 +157,18 @@ class PatientFormTests(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn('email', form.errors)
 
+    def test_contact_number_can_be_shared(self):
+        """Test family members may register with the same mobile number"""
+        Patient.objects.create(
+            first_name='Jane',
+            last_name='Smith',
+            email='jane@example.com',
+            contact_number='+639123456789'
+        )
+
+        form = PatientForm(data=self.valid_form_data)
+        self.assertTrue(form.is_valid(), f"Form errors: {form.errors}")
+
     def test_date_of_birth_future_date(self):
         """Test date of birth cannot be in the future"""
         future_date = date.today() + timedelta(days=1)
@@ -236,8 +253,9 @@ class FindPatientFormTests(TestCase):
 class PatientModelTests(TestCase):
     """Test cases for Patient model"""
 
-    def setUp(self):
-        self.patient = Patient.objects.create(
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = Patient.objects.create(
             first_name='John',
             last_name='Doe',
             email='john@example.com',
@@ -283,8 +301,18 @@ class PatientModelTests(TestCase):
         self.assertTrue(self.patient.can_be_found_by('john@example.com'))
         self.assertTrue(self.patient.can_be_found_by('JOHN@EXAMPLE.COM'))
         self.assertTrue(self.patient.can_be_found_by('+639123456789'))
+        self.assertTrue(self.patient.can_be_found_by('0912 345 6789'))
+        self.assertTrue(self.patient.can_be_found_by('639123456789'))
         self.assertFalse(self.patient.can_be_found_by('wrong@email.com'))
 
+    def test_normalize_phone(self):
+        """Test every accepted mobile spelling normalizes to +63"""
+        for value in ['09123456789', '9123456789', '+639123456789', '639123456789', '0912-345-6789']:
+            with self.subTest(value=value):
+                self.assertEqual(Patient.normalize_phone(value), '+639123456789')
+        # Non-mobile numbers only lose separators
+        self.assertEqual(Patient.normalize_phone('02 8123-4567'), '0281234567')
+
     def test_str_representation(self):
         """Test string representation"""
         self.assertEqual(str(self.patient), 'Doe, John')
\ No newline at end of file
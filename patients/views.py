@@ -5,38 +5,47 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
-from django.db.models import Q, Prefetch, Sum, Max, Count, Case, When, Value, DecimalField
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Prefetch, Sum, Min, Count, Case, When, Value, DecimalField, Exists, OuterRef, Subquery
+from django.db.models.functions import Lower
 from django.http import JsonResponse, HttpResponse
 from django.utils import timezone as django_timezone
 from datetime import date, timedelta, timezone
-import csv
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from io import BytesIO
 
+from core.utils import stream_csv
 from .models import Patient
 from .forms import PatientForm, PatientSearchForm, FindPatientForm
 from appointments.models import Appointment
 
 
-class PatientListView(LoginRequiredMixin, ListView):
-    """Enhanced list view with filtering, search, and export functionality - UPDATED for AM/PM system"""
-    model = Patient
-    template_name = 'patients/patient_list.html'
-    context_object_name = 'patients'
-    paginate_by = 25
+class PatientsPermissionMixin(LoginRequiredMixin):
+    """Require login plus the 'patients' module permission"""
+    required_permission = 'patients'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.has_permission('patients'):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        if not request.user.has_permission(self.required_permission):
             messages.error(request, 'You do not have permission to access this page.')
             return redirect('core:dashboard')
         return super().dispatch(request, *args, **kwargs)
+
+
+class PatientListView(PatientsPermissionMixin, ListView):
+    """Enhanced list view with filtering, search, and export functionality - UPDATED for AM/PM system"""
+    model = Patient
+    template_name = 'patients/patient_list.html'
+    context_object_name = 'patients'
+    paginate_by = 25
     
     def get_queryset(self):
         from appointments.models import Payment
         from django.db.models import F
         
-        queryset = Patient.objects.all().select_related()
+        queryset = Patient.list_objects.all()
         
         # Annotate with completed visit count
         queryset = queryset.annotate(
@@ -61,13 +70,16 @@ class PatientListView(LoginRequiredMixin, ListView):
             )
         )
         
-        # Prefetch last completed appointment and next appointment
+        # Prefetch last completed appointment and next appointment - the list
+        # only shows one of each, so slice per patient instead of loading them all
         queryset = queryset.prefetch_related(
             Prefetch(
                 'appointments',
                 queryset=Appointment.objects.filter(
                     status='completed'
-                ).select_related('service').order_by('-appointment_date'),
+                ).select_related('service').only(
+                    'id', 'patient_id', 'appointment_date', 'service__name'
+                ).order_by('-appointment_date')[:1],
                 to_attr='completed_appointments'
             ),
             Prefetch(
@@ -75,7 +87,9 @@ class PatientListView(LoginRequiredMixin, ListView):
                 queryset=Appointment.objects.filter(
                     status__in=['confirmed', 'pending'],
                     appointment_date__gte=django_timezone.now().date()
-                ).select_related('service').order_by('appointment_date'),
+                ).only(
+                    'id', 'patient_id', 'appointment_date', 'period'
+                ).order_by('appointment_date')[:1],
                 to_attr='upcoming_appointments'
             )
         )
@@ -125,23 +139,23 @@ class PatientListView(LoginRequiredMixin, ListView):
             today = date.today()
             if activity == 'recent':
                 recent_date = today - timedelta(days=30)
-                recent_patient_ids = Appointment.objects.filter(
+                queryset = queryset.filter(Exists(Appointment.objects.filter(
+                    patient=OuterRef('pk'),
                     appointment_date__gte=recent_date,
                     status='completed'
-                ).values_list('patient_id', flat=True).distinct()
-                queryset = queryset.filter(id__in=recent_patient_ids)
+                )))
             elif activity == 'upcoming':
-                upcoming_patient_ids = Appointment.objects.filter(
+                queryset = queryset.filter(Exists(Appointment.objects.filter(
+                    patient=OuterRef('pk'),
                     appointment_date__gte=today,
                     status__in=['confirmed', 'pending']
-                ).values_list('patient_id', flat=True).distinct()
-                queryset = queryset.filter(id__in=upcoming_patient_ids)
+                )))
             elif activity == 'no_recent':
                 old_date = today - timedelta(days=90)
-                recent_patient_ids = Appointment.objects.filter(
+                queryset = queryset.filter(~Exists(Appointment.objects.filter(
+                    patient=OuterRef('pk'),
                     appointment_date__gte=old_date
-                ).values_list('patient_id', flat=True).distinct()
-                queryset = queryset.exclude(id__in=recent_patient_ids)
+                )))
         
         # Apply sorting
         if sort_by == 'name_asc':
@@ -152,14 +166,16 @@ class PatientListView(LoginRequiredMixin, ListView):
             queryset = queryset.order_by('-created_at')
         elif sort_by == 'date_added_asc':
             queryset = queryset.order_by('created_at')
-        elif sort_by == 'last_visit_desc':
-            queryset = queryset.annotate(
-                last_visit_date=Max('appointments__appointment_date')
-            ).order_by(F('last_visit_date').desc(nulls_last=True))
-        elif sort_by == 'last_visit_asc':
-            queryset = queryset.annotate(
-                last_visit_date=Max('appointments__appointment_date')
-            ).order_by(F('last_visit_date').asc(nulls_last=True))
+        elif sort_by in ('last_visit_desc', 'last_visit_asc'):
+            # Correlated subquery so the sort doesn't join in every appointment row
+            last_visit = Appointment.objects.filter(
+                patient=OuterRef('pk')
+            ).order_by('-appointment_date').values('appointment_date')[:1]
+            queryset = queryset.annotate(last_visit_date=Subquery(last_visit))
+            if sort_by == 'last_visit_desc':
+                queryset = queryset.order_by(F('last_visit_date').desc(nulls_last=True))
+            else:
+                queryset = queryset.order_by(F('last_visit_date').asc(nulls_last=True))
         
         return queryset
     
@@ -189,64 +205,76 @@ class PatientListView(LoginRequiredMixin, ListView):
         context['active_filters'] = active_filters
         
         # Get insights for dashboard - UPDATED to exclude pending appointments
-        total_patients = Patient.objects.filter(is_active=True).count()
         today = date.today()
         
+        # Only consider patients with completed appointments (confirmed patients only)
+        old_date = today - timedelta(days=90)
+        recent_visit = Appointment.objects.filter(
+            patient=OuterRef('pk'),
+            appointment_date__gte=old_date,
+            status='completed'
+        )
+        
+        # All patient counts in one pass over the table
+        patient_counts = Patient.objects.aggregate(
+            total=Count('pk'),
+            total_active=Count('pk', filter=Q(is_active=True)),
+            with_email=Count('pk', filter=Q(is_active=True, email__isnull=False) & ~Q(email='')),
+            no_recent_visits=Count('pk', filter=Q(is_active=True) & ~Exists(recent_visit)),
+        )
+        
         # Only count appointments with confirmed patient records
         upcoming_appointments = Appointment.objects.filter(
             appointment_date__gte=today,
             status__in=['confirmed', 'pending'],  # pending appointments with existing patients still count
             patient__isnull=False  # Only count appointments with linked patient records
-        ).values('patient').distinct().count()
-        
-        with_email = Patient.objects.filter(is_active=True, email__isnull=False).exclude(email='').count()
-        
-        # Only consider patients with completed appointments (confirmed patients only)
-        old_date = today - timedelta(days=90)
-        no_recent_visits = Patient.objects.filter(is_active=True).exclude(
-            appointments__appointment_date__gte=old_date,
-            appointments__status='completed',
-            appointments__patient__isnull=False  # Only confirmed appointments
-        ).count()
+        ).aggregate(n=Count('patient', distinct=True))['n']
         
         context['insights'] = {
-            'total_active': total_patients,
+            'total_active': patient_counts['total_active'],
             'upcoming_appointments': upcoming_appointments,
-            'with_email': with_email,
-            'no_recent_visits': no_recent_visits,
+            'with_email': patient_counts['with_email'],
+            'no_recent_visits': patient_counts['no_recent_visits'],
         }
         
         # Total count remains the same (only actual Patient records)
-        context['total_count'] = Patient.objects.count()
-        
-        # Handle export (unchanged)
-        export_format = self.request.GET.get('export')
-        if export_format in ['csv', 'pdf']:
-            return self.export_patients(context['patients'], export_format)
+        context['total_count'] = patient_counts['total']
         
         return context
     
+    def get(self, request, *args, **kwargs):
+        # Handle export - covers every patient matching the current filters, not just the page
+        export_format = request.GET.get('export')
+        if export_format in ['csv', 'pdf']:
+            return self.export_patients(self.get_queryset(), export_format)
+        return super().get(request, *args, **kwargs)
+    
     def export_patients(self, patients, format_type):
         """Export patients to CSV or PDF"""
         if format_type == 'csv':
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="patients.csv"'
+            # Stream plain tuples; the list-page prefetches aren't needed here
+            rows = patients.prefetch_related(None).values_list(
+                'first_name', 'last_name', 'email', 'contact_number', 'address',
+                'date_of_birth', 'created_at', 'visit_count'
+            ).iterator(chunk_size=2000)
             
-            writer = csv.writer(response)
-            writer.writerow(['Name', 'Email', 'Phone', 'Address', 'Date of Birth', 'Created', 'Total Visits'])
+            def format_rows():
+                for first_name, last_name, email, contact_number, address, date_of_birth, created_at, visit_count in rows:
+                    yield [
+                        f"{first_name} {last_name}",
+                        email,
+                        contact_number,
+                        address,
+                        date_of_birth.strftime('%Y-%m-%d') if date_of_birth else '',
+                        created_at.strftime('%Y-%m-%d'),
+                        visit_count or 0,
+                    ]
             
-            for patient in patients:
-                writer.writerow([
-                    patient.full_name,
-                    patient.email,
-                    patient.contact_number,
-                    patient.address,
-                    patient.date_of_birth.strftime('%Y-%m-%d') if patient.date_of_birth else '',
-                    patient.created_at.strftime('%Y-%m-%d'),
-                    getattr(patient, 'visit_count', 0)
-                ])
-            
-            return response
+            return stream_csv(
+                'patients.csv',
+                ['Name', 'Email', 'Phone', 'Address', 'Date of Birth', 'Created', 'Total Visits'],
+                format_rows()
+            )
         
         elif format_type == 'pdf':
             # Simple PDF export using reportlab
@@ -287,18 +315,12 @@ class PatientListView(LoginRequiredMixin, ListView):
             return response
 
 
-class PatientDetailView(LoginRequiredMixin, DetailView):
+class PatientDetailView(PatientsPermissionMixin, DetailView):
     """View patient details with appointment history - UPDATED for AM/PM system and payment context"""
     model = Patient
     template_name = 'patients/patient_detail.html'
     context_object_name = 'patient'
     
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.has_permission('patients'):
-            messages.error(request, 'You do not have permission to access this page.')
-            return redirect('core:dashboard')
-        return super().dispatch(request, *args, **kwargs)
-    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         patient = self.object
@@ -321,41 +343,35 @@ class PatientDetailView(LoginRequiredMixin, DetailView):
         from appointments.models import Payment, PaymentTransaction
         from decimal import Decimal
         
-        # Get all payments for this patient
-        patient_payments = Payment.objects.filter(patient=patient).select_related('appointment__service')
-        
-        # Calculate payment summary
-        total_amount_due = Decimal('0')
-        total_amount_paid = Decimal('0')
-        
-        for payment in patient_payments:
-            total_amount_due += payment.total_amount
-            total_amount_paid += payment.amount_paid
-        
+        patient_payments = Payment.objects.filter(patient=patient)
+        
+        # Calculate payment summary in the database
+        totals = patient_payments.aggregate(
+            payment_count=Count('id'),
+            due=Sum('total_amount'),
+            paid=Sum('amount_paid'),
+            next_due=Min('next_due_date', filter=Q(
+                status__in=['pending', 'partially_paid'],
+                next_due_date__isnull=False
+            )),
+        )
+        total_amount_due = totals['due'] or Decimal('0')
+        total_amount_paid = totals['paid'] or Decimal('0')
         outstanding_balance = total_amount_due - total_amount_paid
         
         # Get recent payments for display (last 5)
-        recent_payments = patient_payments.order_by('-created_at')[:5]
-        
-        # Get next due date and check if overdue
-        next_due_date = None
-        is_overdue = False
+        recent_payments = patient_payments.select_related('appointment__service').order_by('-created_at')[:5]
         
-        overdue_payment = patient_payments.filter(
-            status__in=['pending', 'partially_paid'],
-            next_due_date__isnull=False
-        ).order_by('next_due_date').first()
-        
-        if overdue_payment:
-            next_due_date = overdue_payment.next_due_date
-            is_overdue = next_due_date < today
+        # Next due date comes from the aggregate above
+        next_due_date = totals['next_due']
+        is_overdue = next_due_date is not None and next_due_date < today
         
         # Get last payment transaction
         last_payment = None
-        if patient_payments.exists():
+        if totals['payment_count']:
             last_payment = PaymentTransaction.objects.filter(
-                payment__patient=patient
-            ).order_by('-payment_datetime').first()
+                payment__patient_id=patient.pk
+            ).select_related('payment').order_by('-payment_datetime').first()
         
         context.update({
             'appointments': appointments,
@@ -364,7 +380,7 @@ class PatientDetailView(LoginRequiredMixin, DetailView):
             'cancelled_appointments': cancelled_appointments,
             
             # Payment context
-            'patient_payments': patient_payments,
+            'has_payments': totals['payment_count'] > 0,
             'total_amount_due': total_amount_due,
             'total_amount_paid': total_amount_paid,
             'outstanding_balance': outstanding_balance,
@@ -376,18 +392,12 @@ class PatientDetailView(LoginRequiredMixin, DetailView):
         
         return context
 
-class PatientCreateView(LoginRequiredMixin, CreateView):
+class PatientCreateView(PatientsPermissionMixin, CreateView):
     """Create new patient"""
     model = Patient
     form_class = PatientForm
     template_name = 'patients/patient_form.html'
     
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.has_permission('patients'):
-            messages.error(request, 'You do not have permission to access this page.')
-            return redirect('core:dashboard')
-        return super().dispatch(request, *args, **kwargs)
-    
     def form_valid(self, form):
         messages.success(self.request, f'Patient {form.instance.full_name} created successfully.')
         return super().form_valid(form)
@@ -396,19 +406,13 @@ class PatientCreateView(LoginRequiredMixin, CreateView):
         return reverse_lazy('patients:patient_detail', kwargs={'pk': self.object.pk})
 
 
-class PatientUpdateView(LoginRequiredMixin, UpdateView):
+class PatientUpdateView(PatientsPermissionMixin, UpdateView):
     """Update patient information"""
     model = Patient
     form_class = PatientForm
     template_name = 'patients/patient_form.html'
     context_object_name = 'patient'
     
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.has_permission('patients'):
-            messages.error(request, 'You do not have permission to access this page.')
-            return redirect('core:dashboard')
-        return super().dispatch(request, *args, **kwargs)
-    
     def form_valid(self, form):
         messages.success(self.request, f'Patient {form.instance.full_name} updated successfully.')
         return super().form_valid(form)
@@ -417,19 +421,13 @@ class PatientUpdateView(LoginRequiredMixin, UpdateView):
         return reverse_lazy('patients:patient_detail', kwargs={'pk': self.object.pk})
 
 
-class PatientSearchView(LoginRequiredMixin, ListView):
+class PatientSearchView(PatientsPermissionMixin, ListView):
     """Search patients with advanced filtering"""
     model = Patient
     template_name = 'patients/patient_search.html'
     context_object_name = 'patients'
     paginate_by = 20
     
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.has_permission('patients'):
-            messages.error(request, 'You do not have permission to access this page.')
-            return redirect('core:dashboard')
-        return super().dispatch(request, *args, **kwargs)
-    
     def get_queryset(self):
         form = PatientSearchForm(self.request.GET)
         queryset = Patient.objects.none()
@@ -440,15 +438,15 @@ class PatientSearchView(LoginRequiredMixin, ListView):
             
             if query:
                 if search_type == 'name':
-                    queryset = Patient.objects.filter(
+                    queryset = Patient.list_objects.filter(
                         Q(first_name__icontains=query) | Q(last_name__icontains=query)
                     )
                 elif search_type == 'email':
-                    queryset = Patient.objects.filter(email__icontains=query)
+                    queryset = Patient.list_objects.filter(email__icontains=query)
                 elif search_type == 'phone':
-                    queryset = Patient.objects.filter(contact_number__icontains=query)
+                    queryset = Patient.list_objects.filter(contact_number__icontains=query)
                 else:  # all
-                    queryset = Patient.objects.filter(
+                    queryset = Patient.list_objects.filter(
                         Q(first_name__icontains=query) |
                         Q(last_name__icontains=query) |
                         Q(email__icontains=query) |
@@ -464,26 +462,21 @@ class PatientSearchView(LoginRequiredMixin, ListView):
         return context
 
 
-class FindPatientView(LoginRequiredMixin, ListView):
+class FindPatientView(PatientsPermissionMixin, ListView):
     """Find patient by email or phone for appointment booking"""
     model = Patient
     template_name = 'patients/find_patient.html'
     context_object_name = 'patients'
     
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.has_permission('patients'):
-            messages.error(request, 'You do not have permission to access this page.')
-            return redirect('core:dashboard')
-        return super().dispatch(request, *args, **kwargs)
-    
     def get_queryset(self):
         identifier = self.request.GET.get('identifier', '').strip()
         if not identifier:
             return Patient.objects.none()
         
-        # Search by email or phone number
-        return Patient.objects.filter(
-            Q(email__iexact=identifier) | Q(contact_number=identifier)
+        # Search by email or phone number; numbers are stored normalized and
+        # email is compared as LOWER(email) so both sides can use an index
+        return Patient.list_objects.annotate(email_lower=Lower('email')).filter(
+            Q(email_lower=identifier.lower()) | Q(contact_number=Patient.normalize_phone(identifier))
         ).order_by('last_name', 'first_name')
     
     def get_context_data(self, **kwargs):
@@ -507,7 +500,17 @@ def toggle_patient_active(request, pk):
     
     patient = get_object_or_404(Patient, pk=pk)
     patient.is_active = not patient.is_active
-    patient.save()
+    try:
+        with transaction.atomic():
+            patient.save()
+    except IntegrityError:
+        # Reactivating would clash with another active patient's email
+        messages.error(
+            request,
+            f'Patient {patient.full_name} cannot be activated: another active patient '
+            'already uses the same email address.'
+        )
+        return redirect('patients:patient_detail', pk=pk)
     
     status = 'activated' if patient.is_active else 'deactivated'
     messages.success(request, f'Patient {patient.full_name} has been {status}.')
@@ -522,12 +525,17 @@ def patient_quick_info(request, pk):
         return JsonResponse({'error': 'Permission denied'}, status=403)
     
     try:
-        patient = Patient.objects.get(pk=pk)
+        patient = Patient.objects.annotate(
+            completed_count=Count('appointments', filter=Q(appointments__status='completed'))
+        ).only(
+            'id', 'first_name', 'last_name', 'email', 'contact_number', 'date_of_birth'
+        ).get(pk=pk)
         
         # Get recent appointments - UPDATED to use appointment_date
-        recent_appointments = patient.appointments.filter(
+        recent_appointments = Appointment.objects.filter(
+            patient_id=patient.pk,
             appointment_date__gte=date.today() - timedelta(days=30)
-        ).order_by('-appointment_date', '-period')[:3]
+        ).select_related('service').order_by('-appointment_date', '-period')[:3]
         
         appointments_data = []
         for apt in recent_appointments:
@@ -545,9 +553,8 @@ def patient_quick_info(request, pk):
             'phone': patient.contact_number,
             'age': patient.age,
             'is_minor': patient.is_minor,
-            'medical_notes': patient.medical_notes,
             'recent_appointments': appointments_data,
-            'total_visits': patient.appointments.filter(status='completed').count(),
+            'total_visits': patient.completed_count,
         }
         
         return JsonResponse(data)
@@ -82,8 +82,24 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.get_full_name()} ({self.username})"
    
+    def save(self, *args, **kwargs):
+        # Role may have changed - drop memoized permission checks
+        self.__dict__.pop('_permission_cache', None)
+        super().save(*args, **kwargs)
+    
     def has_permission(self, module_name):
-        """Check if user has permission for a specific module"""
+        """
+        Check if user has permission for a specific module
+        
+        Results are memoized on the instance, so repeated checks during a
+        request (dispatch, quick actions, template tags) are dict lookups.
+        """
+        cache = self.__dict__.setdefault('_permission_cache', {})
+        if module_name not in cache:
+            cache[module_name] = self._check_permission(module_name)
+        return cache[module_name]
+    
+    def _check_permission(self, module_name):
         if self.is_superuser:
             return True
         if not self.role or self.role.is_archived:  # Users with archived roles lose access
@@ -9,13 +9,7 @@ def has_permission(user, module_name):
     if not user or not user.is_authenticated:
         return False
     
-    if user.is_superuser:
-        return True
-        
-    if not hasattr(user, 'role') or not user.role:
-        return False
-        
-    return user.role.permissions.get(module_name, False)
+    return user.has_permission(module_name)
 
 @register.simple_tag
 def can_access(user, module_name):